@@ -17,7 +17,10 @@ except ImportError:
     # If the lakeshore package is not installed, define None
     Model224 = None
     Model372 = None
-import h5py
+from collections import deque
+from core.h5writer import H5TimeSeriesWriter
+from core.sample_buffer import SampleBuffer
+from core.trend import TrendSet
 
 
 
@@ -68,128 +71,54 @@ import h5py
 
 
 class Data_Acquisition(Thread):
-    def __init__(self, data, filename, lock, start_aq=True):
+    def __init__(self, samples, writer, lock, start_aq=True):
         self.lock = lock
-        self.data_buffer = data
-        self.max_buffer = CHUNK
+        # SampleBuffer shared with Cooldown_routine, one sample per second
+        self.samples = samples
+        self.sample = {}
         self.start_acquisition = start_aq
-        self.filename = filename
+        # H5TimeSeriesWriter, buffers samples and writes them in blocks
+        self.writer = writer
         super().__init__()
 
+    def record(self, key, dataset, value):
+        self.sample[key] = value
+        self.writer.append(dataset, value)
+
     def run(self):
         start_time = datetime.datetime.now().timestamp()
-        with self.lock:
-            
-            current_time = datetime.datetime.now().timestamp() - start_time
-            self.data_buffer['time'].append(current_time)
-            if len(self.data_buffer['time']) > self.max_buffer:
-                with h5py.File(self.filename, 'a') as database:
-                    database['Time'][0:] = self.data_buffer['time']
-                self.data_buffer['time'] = []
-
-            for device in devices_list:
-                if device is model372:
-                    for channel in device.input_channels:
-                        # if channel == '9': 
-                        #     self.data_buffer[f'{device.name}/{channel}'].append(
-                        #     device.get_sensor(channel))
-                        #     if len(self.data_buffer[f'{device.name}/{channel}']) > self.max_buffer:
-                        #         with h5py.File(self.filename, 'a') as database:
-                        #             database[f'{device.name}/{channel}_sensor'][0:] = self.data_buffer[f'{device.name}/{channel}']
-                        #         self.data_buffer[f'{device.name}/{channel}'] = []
-                        # else:
-                        self.data_buffer[f'{device.name}/{channel}'].append(device.get_temperature(channel))
-                    if len(self.data_buffer[f'{device.name}/{channel}']) > self.max_buffer:
-                        with h5py.File(self.filename, 'a') as database:
-                            database[f'{device.name}/{channel}_temperature'][0:] = self.data_buffer[f'{device.name}/{channel}']
-                        self.data_buffer[f'{device.name}/{channel}'] = []
-                    for channel in device.output_channels:
-                        self.data_buffer[f'{device.name}/{channel}'].append(
-                            device.get_output(channel))
-                        if len(self.data_buffer[f'{device.name}/{channel}']) > self.max_buffer:
-                            with h5py.File(self.filename, 'a') as database:
-                                database[f'{device.name}/{channel}_percentage'][0:] = self.data_buffer[f'{device.name}/{channel}']
-                            self.data_buffer[f'{device.name}/{channel}'] = []
-
-                else:
-                    for channel in device.input_channels:
-                        self.data_buffer[f'{device.name}/{channel}'].append(
-                            device.get_temperature(channel))
-                        if len(self.data_buffer[f'{device.name}/{channel}']) > self.max_buffer:
-                            with h5py.File(self.filename, 'a') as database:
-                                database[f'{device.name}/{channel}_temperature'][0:] = self.data_buffer[f'{device.name}/{channel}']
-                            self.data_buffer[f'{device.name}/{channel}'] = []
-                
-        
-        time.sleep(1)
-
-
-        
-        while self.start_acquisition:
-            with self.lock:
-                current_time = datetime.datetime.now().timestamp() - start_time
-                self.data_buffer['time'].append(current_time)
-                if len(self.data_buffer['time']) > self.max_buffer:
-                    with h5py.File(self.filename, 'a') as database:
-                        database['Time'].resize(
-                            (database['Time'].shape[0]+len(self.data_buffer['time'])), axis=0)
-                        database['Time'][-len(self.data_buffer['time']):] = self.data_buffer['time']
-                    self.data_buffer['time'] = []
-                for device in devices_list:
-                    if device is model372:
-                        for channel in device.output_channels:
-                            self.data_buffer[f'{device.name}/{channel}'].append(
-                                device.get_output(channel))
-                            if len(self.data_buffer[f'{device.name}/{channel}']) > self.max_buffer:
-                                with h5py.File(self.filename, 'a') as database:
-                                    database[f'{device.name}/{channel}_percentage'].resize(
-                                        (database[f'{device.name}/{channel}_percentage'].shape[0]+len(self.data_buffer[f'{device.name}/{channel}'])), axis=0)
-                                    database[f'{device.name}/{channel}_percentage'][-len(
-                                        self.data_buffer[f'{device.name}/{channel}']):] = self.data_buffer[f'{device.name}/{channel}']
-                                self.data_buffer[f'{device.name}/{channel}'] = []
-
+        try:
+            while self.start_acquisition:
+                self.sample = {}
+                with self.lock:
+                    current_time = datetime.datetime.now().timestamp() - start_time
+                    self.record('time', 'Time', current_time)
+                    for device in devices_list:
+                        if device is model372:
+                            for channel in device.output_channels:
+                                self.record(f'{device.name}/{channel}',
+                                            f'{device.name}/{channel}_percentage',
+                                            device.get_output(channel))
                         for channel in device.input_channels:
-                            # if channel == '9':
-                            #     self.data_buffer[f'{device.name}/{channel}'].append(
-                            #     device.get_sensor(channel))
-                            #     if len(self.data_buffer[f'{device.name}/{channel}']) > self.max_buffer:
-                            #         with h5py.File(self.filename, 'a') as database:
-                            #             database[f'{device.name}/{channel}_sensor'].resize(
-                            #                 (database[f'{device.name}/{channel}_sensor'].shape[0]+len(self.data_buffer[f'{device.name}/{channel}'])), axis=0)
-                            #             database[f'{device.name}/{channel}_sensor'][-len(
-                            #                 self.data_buffer[f'{device.name}/{channel}']):] = self.data_buffer[f'{device.name}/{channel}']
-                            #         self.data_buffer[f'{device.name}/{channel}'] = []       
-                            # else:
-                            self.data_buffer[f'{device.name}/{channel}'].append(
-                                device.get_temperature(channel))
-                            if len(self.data_buffer[f'{device.name}/{channel}']) > self.max_buffer:
-                                with h5py.File(self.filename, 'a') as database:
-                                    database[f'{device.name}/{channel}_temperature'].resize(
-                                        (database[f'{device.name}/{channel}_temperature'].shape[0]+len(self.data_buffer[f'{device.name}/{channel}'])), axis=0)
-                                    database[f'{device.name}/{channel}_temperature'][-len(self.data_buffer[f'{device.name}/{channel}']):] = self.data_buffer[f'{device.name}/{channel}']
-                                self.data_buffer[f'{device.name}/{channel}'] = []                                               
-                    else:        
-                        for channel in device.input_channels:
-                            self.data_buffer[f'{device.name}/{channel}'].append(
-                                device.get_temperature(channel))
-                            if len(self.data_buffer[f'{device.name}/{channel}']) > self.max_buffer:
-                                with h5py.File(self.filename, 'a') as database:
-                                    database[f'{device.name}/{channel}_temperature'].resize(
-                                        (database[f'{device.name}/{channel}_temperature'].shape[0]+len(self.data_buffer[f'{device.name}/{channel}'])), axis=0)
-                                    database[f'{device.name}/{channel}_temperature'][-len(
-                                        self.data_buffer[f'{device.name}/{channel}']):] = self.data_buffer[f'{device.name}/{channel}']
-                                self.data_buffer[f'{device.name}/{channel}'] = []
-                   
-
+                            self.record(f'{device.name}/{channel}',
+                                        f'{device.name}/{channel}_temperature',
+                                        device.get_temperature(channel))
+                # publish the complete sample at once
+                self.samples.append(self.sample)
 
+                time.sleep(1)
+        finally:
+            self.writer.close()
 
 
-            
-            time.sleep(1)
-            
 class Cooldown_routine(Thread):
-    def __init__(self, data, lock):
-        self.data_buffer = data
+    def __init__(self, samples, lock, history=600):
+        # private cursor into the shared SampleBuffer, plus the last
+        # `history` samples of every channel for the checks below
+        self.samples = samples.cursor()
+        self.recent = {key: deque(maxlen=history) for key in samples.keys}
+        # windowed slope per channel, read by isfinished()
+        self.trends = TrendSet(window=60.0)
         self.lock = lock
         
         super().__init__()
@@ -230,12 +159,12 @@ class Cooldown_routine(Thread):
 
         '''precooling routine (not cycling but done just once)'''
 
-        # data_copy = self.data_buffer.copy()
+        # data_copy = self.recent
         # time.sleep(10)
         # self.update_list_of_temperature(data_copy)
         # for system in [He7_B_channels, He7_A_channels]:
         #     print(f"checking {system['device'].name}")
-        #     while data_copy[f"LakeshoreModel372/{system['He4_head']}"][-1] > 4.0 and isfinished(data_copy['time'], data_copy[f"LakeshoreModel372/{system['He4_head']}"]):
+        #     while data_copy[f"LakeshoreModel372/{system['He4_head']}"][-1] > 4.0 and isfinished(self.trends.get(f"LakeshoreModel372/{system['He4_head']}")):
         #         time.sleep(1)
         #         self.update_list_of_temperature(data_copy)
         #     print(f"4He Heat switch on {system['device'].name}")
@@ -254,7 +183,7 @@ class Cooldown_routine(Thread):
         #     print(f"checking {system['device'].name} {system['He3_head']}")
         #     self.update_list_of_temperature(data_copy)
             
-        #     while data_copy[f"LakeshoreModel372/{system['He3_head']}"][-1] > 1.5 and isfinished(data_copy['time'], data_copy[f"LakeshoreModel372/{system['He3_head']}"]):
+        #     while data_copy[f"LakeshoreModel372/{system['He3_head']}"][-1] > 1.5 and isfinished(self.trends.get(f"LakeshoreModel372/{system['He3_head']}")):
         #         time.sleep(1)
         #         self.update_list_of_temperature(data_copy)
         #     print(f"Heater on {system['device'].name} {system['He3_head']}")
@@ -271,7 +200,7 @@ class Cooldown_routine(Thread):
 
         # for system in [He7_A_channels, He7_B_channels]:
         #     print('Aspettando l\'inverno')
-        #     while (condition_temperature := data_copy[f"LakeshoreModel372/{system['He3_head']}"][-1] > 0.45) and (condition_stability := isfinished(data_copy['time'], data_copy[f"LakeshoreModel372/{system['He3_head']}"] )):
+        #     while (condition_temperature := data_copy[f"LakeshoreModel372/{system['He3_head']}"][-1] > 0.45) and (condition_stability := isfinished(self.trends.get(f"LakeshoreModel372/{system['He3_head']}"))):
         #         time.sleep(2)
         #         self.update_list_of_temperature(data_copy)
 
@@ -321,8 +250,16 @@ class Cooldown_routine(Thread):
                     list_of_systems[key][1] = True
 
     def update_list_of_temperature(self, data_list):
-        for key in self.data_buffer:
-            data_list[key].extend(self.data_buffer[key])
+        new = self.samples.read()
+        for key, values in new.items():
+            data_list[key].extend(values)
+        for i, t in enumerate(new['time']):
+            self.trends.update(t, {key: values[i] for key, values in new.items()
+                                   if key != 'time' and isinstance(values[i], (int, float))})
+
+    def wait_for_data(self, data_list, timeout=2):
+        self.samples.wait(timeout)
+        self.update_list_of_temperature(data_list)
         
     def cryo_cool(self, system):
         print(f"Switching off Heat switches on {system['device'].name}")
@@ -331,14 +268,13 @@ class Cooldown_routine(Thread):
             switch_off(system['device'], system['He4_aio'])
             switch_off(system['device'], system['He3_aio'])
             
-        data_copy = self.data_buffer.copy()
+        data_copy = self.recent
         print(f"checking {system['device'].name} waiting for switches to cool down below 10K")
         time.sleep(10)
         self.update_list_of_temperature(data_copy)
 
         while data_copy[f"{system['device'].name}/{system['He4_switch']}"][-1] > 10 or data_copy[f"{system['device'].name}/{system['He3_switch']}"][-1] > 10:
-            time.sleep(2)
-            self.update_list_of_temperature(data_copy)
+            self.wait_for_data(data_copy)
         print(f"Heater on {system['device'].name}, waiting for 4He head to reach 3 K")
 
         with self.lock:
@@ -356,9 +292,8 @@ class Cooldown_routine(Thread):
             
         self.update_list_of_temperature(data_copy)
 
-        while data_copy[f"LakeshoreModel372/{system['He4_head']}"][-1] > 3.1: #and isfinished(data_copy['time'], data_copy[f"LakeshoreModel372/{system['He4_head']}"]):
-            time.sleep(2)
-            self.update_list_of_temperature(data_copy)
+        while data_copy[f"LakeshoreModel372/{system['He4_head']}"][-1] > 3.1: #and isfinished(self.trends.get(f"LakeshoreModel372/{system['He4_head']}")):
+            self.wait_for_data(data_copy)
         
         print(f"Heat switch on {system['device'].name}, waiting for 3He to reach 1.2 K")
 
@@ -375,9 +310,8 @@ class Cooldown_routine(Thread):
 
         self.update_list_of_temperature(data_copy)
 
-        while data_copy[f"LakeshoreModel372/{system['He3_head']}"][-1] > 1.2: #and isfinished(data_copy['time'], data_copy[f"LakeshoreModel372/{system['He3_head']}"]):
-            time.sleep(2)
-            self.update_list_of_temperature(data_copy)
+        while data_copy[f"LakeshoreModel372/{system['He3_head']}"][-1] > 1.2: #and isfinished(self.trends.get(f"LakeshoreModel372/{system['He3_head']}")):
+            self.wait_for_data(data_copy)
 
 
         print(f"Heat switch on on {system['device'].name}, waiting for 3He to reaching <450mK")
@@ -391,9 +325,8 @@ class Cooldown_routine(Thread):
         self.update_list_of_temperature(data_copy)
 
         print('waking again, startint to check')
-        while (condition_temperature := data_copy[f"LakeshoreModel372/{system['He3_head']}"][-1] > 0.450): #and (condition_stability := isfinished(data_copy['time'], data_copy[f"LakeshoreModel372/{system['He3_head']}"] )):
-            time.sleep(2)
-            self.update_list_of_temperature(data_copy)
+        while (condition_temperature := data_copy[f"LakeshoreModel372/{system['He3_head']}"][-1] > 0.450): #and (condition_stability := isfinished(self.trends.get(f"LakeshoreModel372/{system['He3_head']}"))):
+            self.wait_for_data(data_copy)
 
         if not condition_temperature:
             print(f'walrus activated, sleeping 10 minutes starting at {datetime.datetime.now()}')
@@ -446,17 +379,12 @@ def heater_off(device, channel):
     device.disable_PID(channel)
     device.set_heater_output(channel, 0)
 
-def isfinished(time_buffer, temperature_buffer):
-    try:
-        Y = temperature_buffer[-1] - temperature_buffer[-20]
-        X = time_buffer[-1] - time_buffer[-20]
-        # X = X.total_seconds()
-        slope = Y/X
-        if slope > 0:
-            return False
-        else:
-            return True
-    except:
+def isfinished(trend):
+    # True while the channel is still cooling, or there is not enough data yet
+    slope = trend.slope if trend is not None else None
+    if slope is not None and slope > 0:
+        return False
+    else:
         return True
     
     
@@ -510,58 +438,33 @@ if __name__== "__main__":
 
 
     # Initialise the database in hdf5
-    CHUNK = 1
+    SAMPLE_HISTORY = 3600  # samples kept in memory for the cooldown routine
+    H5_CHUNK = 300  # samples per HDF5 write, ~5 min at 1 Hz
     today = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-    shared_data = {}
     filename = f'{database_dir}/{today}_cooldown.hdf5'
-    try:
-        with h5py.File(f'{filename}', 'w-', libver='latest') as database:
-            database.create_dataset('Time', shape=(
-                CHUNK), chunks=True, maxshape=(None,))
-
-            shared_data['time'] = []
-            for device in devices_list:
-                if device is model372:
-                    tmp = database.create_group(f'{device.name}')
-
-                    for channel in device.output_channels:
-                        tmp.create_dataset(f'{channel}_percentage', shape=(
-                            CHUNK), chunks=True, maxshape=(None,))
-                        shared_data[f'{device.name}/{channel}'] = []
-                    for channel in device.input_channels:
-                        # if channel == '9':
-                        #     tmp.create_dataset(f'{channel}_sensor', shape=(
-                        #     CHUNK), chunks=True, maxshape=(None,))
-                        #     shared_data[f'{device.name}/{channel}'] = []
-                        # else:
-                        tmp.create_dataset(f'{channel}_temperature', shape=(
-                        CHUNK), chunks=True, maxshape=(None,))
-
-                        shared_data[f'{device.name}/{channel}'] = []
-                
-                else:
-                    tmp = database.create_group(f'{device.name}')
-                    for channel in device.input_channels:
-                        tmp.create_dataset(f'{channel}_temperature', shape=(
-                            CHUNK), chunks=True, maxshape=(None,))
-                    
-                        shared_data[f'{device.name}/{channel}'] = []
-
-    except:
+    if os.path.exists(filename):
         print(
             f'File {filename} already exists. Adding data to the existing file')
-        # with h5py.File(f'{today}_cooldown.hdf5', 'a', libver='latest') as database:
-        shared_data['time'] = []
-        for device in devices_list:
-            for channel in device.input_channels:
-                shared_data[f'{device.name}/{channel}'] = []
 
-    # database.swmr_mode = True
+    datasets = ['Time']
+    keys = ['time']
+    for device in devices_list:
+        if device is model372:
+            for channel in device.output_channels:
+                datasets.append(f'{device.name}/{channel}_percentage')
+                keys.append(f'{device.name}/{channel}')
+        for channel in device.input_channels:
+            datasets.append(f'{device.name}/{channel}_temperature')
+            keys.append(f'{device.name}/{channel}')
+    shared_data = SampleBuffer(keys, capacity=SAMPLE_HISTORY)
+
+    # one open handle, block writes, compressed, readable live via SWMR
+    writer = H5TimeSeriesWriter(filename, datasets, chunk=H5_CHUNK, flush_interval=60.0)
 
 
     serial_lock = Lock()
     
-    data = Data_Acquisition(shared_data, filename,  lock = serial_lock, start_aq=True)
+    data = Data_Acquisition(shared_data, writer, lock = serial_lock, start_aq=True)
     cooldown = Cooldown_routine(shared_data, lock = serial_lock)
     
 
@@ -0,0 +1,113 @@
+import threading
+import time
+
+import numpy as np
+import h5py
+
+
+class H5TimeSeriesWriter:
+    """
+    Buffered append-only writer for 1-D HDF5 time series.
+
+    The file stays open for the whole run. Samples are buffered in memory
+    per dataset and written in blocks, either when `chunk` samples are
+    buffered for a dataset or when `flush_interval` seconds have passed since
+    the last flush. Datasets are chunked `chunk` samples at a time and
+    compressed.
+
+    With swmr=True the file is switched to SWMR mode once all datasets
+    exist, so a reader opening it with h5py.File(filename, "r", swmr=True)
+    can follow along (call dataset.refresh() to see new samples).
+
+        writer = H5TimeSeriesWriter("log.h5", ["time", "CTC100A/In1"])
+        writer.append_row({"time": t, "CTC100A/In1": T})
+        writer.close()
+    """
+
+    def __init__(self, filename, datasets, chunk=256, flush_interval=30.0,
+                 compression="gzip", compression_opts=4, swmr=True, dtype=float):
+        self.filename = filename
+        self.chunk = chunk
+        self.flush_interval = flush_interval
+        self.swmr = swmr
+        self.lock = threading.Lock()
+
+        self.file = h5py.File(filename, "a", libver="latest")
+        self.datasets = {}
+        self.buffers = {}
+        for name in datasets:
+            self.datasets[name] = self._require_dataset(name, dtype, compression, compression_opts)
+            self.buffers[name] = []
+
+        # SWMR needs every dataset to exist before it is switched on
+        if swmr:
+            self.file.swmr_mode = True
+
+        self.last_flush = time.monotonic()
+
+    def _require_dataset(self, name, dtype, compression, compression_opts):
+        if name in self.file:
+            return self.file[name]
+        # h5py creates intermediate groups ("CTC100A/...") as needed
+        return self.file.create_dataset(
+            name, shape=(0,), maxshape=(None,), dtype=dtype,
+            chunks=(self.chunk,),
+            compression=compression,
+            compression_opts=compression_opts if compression == "gzip" else None,
+            shuffle=compression is not None,
+        )
+
+    # ---------------- Appending ----------------
+    def append(self, name, value):
+        with self.lock:
+            buffer = self.buffers[name]
+            buffer.append(np.nan if value is None else value)
+            if len(buffer) >= self.chunk or self._interval_elapsed():
+                self._flush()
+
+    def append_row(self, values: dict):
+        """Append one sample to several datasets at once."""
+        with self.lock:
+            full = False
+            for name, value in values.items():
+                buffer = self.buffers[name]
+                buffer.append(np.nan if value is None else value)
+                full = full or len(buffer) >= self.chunk
+            if full or self._interval_elapsed():
+                self._flush()
+
+    def _interval_elapsed(self):
+        return time.monotonic() - self.last_flush >= self.flush_interval
+
+    # ---------------- Flushing ----------------
+    def flush(self):
+        with self.lock:
+            self._flush()
+
+    def _flush(self):
+        for name, buffer in self.buffers.items():
+            if not buffer:
+                continue
+            ds = self.datasets[name]
+            n = ds.shape[0]
+            ds.resize((n + len(buffer),))
+            ds[n:] = buffer
+            if self.swmr:
+                ds.flush()
+            self.buffers[name] = []
+        self.file.flush()
+        self.last_flush = time.monotonic()
+
+    def close(self):
+        with self.lock:
+            if self.file is None:
+                return
+            self._flush()
+            self.file.close()
+            self.file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -1,10 +1,13 @@
 import time
+import bisect
+import threading
 import serial
 import numpy as np
 import serial.tools.list_ports
 import matplotlib.pyplot as plt
 import matplotlib.animation as animation
-import h5py
+
+from core.h5writer import H5TimeSeriesWriter
 
 from devices.CTC100 import CTC100Device
 from devices.lakeshore224device import LakeShore224Device
@@ -13,10 +16,13 @@ from devices.lakeshore372device import LakeShore372Device
 DEBUG = False
 
 class TemperaturePlotter():
-    def __init__(self, window_seconds=300, interval=2000, h5_filename=None):
+    def __init__(self, window_seconds=300, interval=2000, h5_filename=None, read_interval=None):
         super().__init__()
         self.window_seconds = window_seconds
+        # redraw period of each figure (ms)
         self.interval = interval
+        # hardware read period (s), independent of the redraw rate
+        self.read_interval = read_interval if read_interval is not None else interval / 1000
 
         self.devices = {}
         self.groups = {}
@@ -28,8 +34,13 @@ class TemperaturePlotter():
         self.anims = []
         self.running = True
 
-        self.h5_file = None
-        self.h5_groups = {}
+        # self.data is filled by the acquisition thread and read by the
+        # animation callbacks
+        self.data_lock = threading.Lock()
+        self.acquisition = None
+
+        self.h5_writer = None
+        self.h5_datasets = set()
         self.h5_filename = h5_filename or f"temperature_log_{time.strftime('%Y%m%d_%H%M%S')}.h5"
 
     def connect_devices(self):
@@ -80,18 +91,15 @@ class TemperaturePlotter():
         return readings
 
     def setup_h5(self, init_read):
-        self.h5_file = h5py.File(self.h5_filename, "w")
         for dev_name, sensors in init_read.items():
-            grp = self.h5_file.create_group(dev_name)
-            self.h5_groups[dev_name] = grp
-            grp.create_dataset("time", shape=(0,), maxshape=(None,), dtype=float)
+            self.h5_datasets.add(f"{dev_name}/time")
             for ch in sensors.keys():
-                grp.create_dataset(ch, shape=(0,), maxshape=(None,), dtype=float)
+                self.h5_datasets.add(f"{dev_name}/{ch}")
+        self.h5_writer = H5TimeSeriesWriter(self.h5_filename, sorted(self.h5_datasets))
         print(f"HDF5 logging to: {self.h5_filename}")
 
-    def append_dataset(self, ds, value):
-        ds.resize((ds.shape[0]+1,))
-        ds[-1] = value
+    def append_dataset(self, name, value):
+        self.h5_writer.append(name, value)
 
     def setup_plots(self):
         figs, axes, lines, data, legends = {}, {}, {}, {}, {}
@@ -113,49 +121,60 @@ class TemperaturePlotter():
             legends[win_name] = ax.legend(loc='upper left', bbox_to_anchor=(1.02,1.0), prop={'size':11})
         self.figs, self.axes, self.lines, self.data, self.legends = figs, axes, lines, data, legends
 
-    def update(self, frame):
-        if not self.running: return
+    # ---------------- Acquisition thread ----------------
+    def acquire(self):
+        while self.running:
+            t_read = time.time()
+            current_time = t_read - self.start_time
+            temps = self.read_temperatures()
+
+            with self.data_lock:
+                for win_name, sensors in self.groups.items():
+                    self.data[win_name]["times"].append(current_time)
+                    for ch in sensors:
+                        val = None
+                        for dev_temps in temps.values():
+                            if ch in dev_temps: val = dev_temps[ch]
+                        if val is None or (isinstance(val,float) and np.isnan(val)): continue
+                        self.data[win_name][ch].append(val)
+
+                        # ---------------- HDF5 Logging ----------------
+                        grp_name = win_name.split()[0]  # crude mapping, adjust if needed
+                        if f"{grp_name}/{ch}" in self.h5_datasets:
+                            self.append_dataset(f"{grp_name}/{ch}", val)
+                            self.append_dataset(f"{grp_name}/time", current_time)
+
+            time.sleep(max(0.0, self.read_interval - (time.time() - t_read)))
+
+    # ---------------- Redraw (one figure per animation) ----------------
+    def update(self, frame, win_name):
+        if not self.running: return []
         current_time = time.time() - self.start_time
-        temps = self.read_temperatures()
+        sensors = self.groups[win_name]
 
-        for win_name, sensors in self.groups.items():
-            self.data[win_name]["times"].append(current_time)
-            for i, ch in enumerate(sensors):
-                val = None
-                for dev_temps in temps.values():
-                    if ch in dev_temps: val = dev_temps[ch]
-                if val is None or (isinstance(val,float) and np.isnan(val)): continue
-                self.data[win_name][ch].append(val)
-
-                # ---------------- HDF5 Logging ----------------
-                grp_name = win_name.split()[0]  # crude mapping, adjust if needed
-                if grp_name in self.h5_groups and ch in self.h5_groups[grp_name]:
-                    self.append_dataset(self.h5_groups[grp_name][ch], val)
-                    self.append_dataset(self.h5_groups[grp_name]["time"], current_time)
-
-                times = self.data[win_name]["times"]
-                yvals = self.data[win_name][ch]
-                if self.window_seconds:
-                    start_idx = next((j for j,t in enumerate(times) if t >= current_time - self.window_seconds), 0)
-                    xdata = times[start_idx:]
-                    ydata = yvals[start_idx:]
-                else:
-                    xdata = times
-                    ydata = yvals
-                self.lines[win_name][i].set_data(xdata, ydata)
-                grad = (ydata[-1]-ydata[0])/((xdata[-1]-xdata[0])/60) if len(ydata)>1 else 0
-                self.legends[win_name].texts[i].set_text(f"{ch}\n {ydata[-1]:.3f} K\n {grad:.4f} K/min")
-
-            ax = self.axes[win_name]
+        with self.data_lock:
+            times = self.data[win_name]["times"]
+            start_idx = 0
             if self.window_seconds:
-                ax.set_xlim(max(0, current_time-self.window_seconds), current_time)
-            else:
-                ax.set_xlim(0, current_time)
-            ax.relim()
-            ax.autoscale_view()
-
-        if self.h5_file:
-            self.h5_file.flush()
+                start_idx = bisect.bisect_left(times, current_time - self.window_seconds)
+            xdata = times[start_idx:]
+            series = {ch: self.data[win_name][ch][start_idx:] for ch in sensors}
+
+        for i, ch in enumerate(sensors):
+            ydata = series[ch]
+            if not ydata:
+                continue
+            self.lines[win_name][i].set_data(xdata, ydata)
+            grad = (ydata[-1]-ydata[0])/((xdata[-1]-xdata[0])/60) if len(ydata)>1 else 0
+            self.legends[win_name].texts[i].set_text(f"{ch}\n {ydata[-1]:.3f} K\n {grad:.4f} K/min")
+
+        ax = self.axes[win_name]
+        if self.window_seconds:
+            ax.set_xlim(max(0, current_time-self.window_seconds), current_time)
+        else:
+            ax.set_xlim(0, current_time)
+        ax.relim()
+        ax.autoscale_view()
         return []
 
     def run(self):
@@ -180,16 +199,22 @@ class TemperaturePlotter():
         self.setup_h5(init_read)
 
         self.start_time = time.time()
-        for fig in self.figs.values():
-            anim = animation.FuncAnimation(fig, self.update, interval=self.interval, blit=False)
+        self.acquisition = threading.Thread(target=self.acquire, daemon=True)
+        self.acquisition.start()
+
+        for win_name, fig in self.figs.items():
+            anim = animation.FuncAnimation(fig, self.update, fargs=(win_name,),
+                                           interval=self.interval, blit=False)
             self.anims.append(anim)
 
         try:
             plt.show()
         finally:
-            if self.h5_file:
+            self.running = False
+            self.acquisition.join()
+            if self.h5_writer:
                 print("Closing HDF5 file...")
-                self.h5_file.close()
+                self.h5_writer.close()
                 print("HDF5 file closed.")
 
     def stop(self):
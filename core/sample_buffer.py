@@ -0,0 +1,81 @@
+import threading
+
+
+class SampleBuffer:
+    """
+    Fixed-size ring of samples shared by one producer and many consumers.
+
+    Every sample is a dict {key: value} with the same keys (e.g. "time",
+    "ctc100A/In1", ...). The producer appends whole samples; each consumer
+    reads through its own SampleCursor, which only returns samples it has
+    not seen yet. Memory is bounded by `capacity` samples, and a consumer that
+    falls more than `capacity` samples behind loses the oldest ones.
+
+    Readers never take a lock: the producer fills a slot before publishing it
+    by bumping `count`, and a reader drops any slot that was overwritten
+    while it was copying. The condition variable is only used to wake
+    consumers waiting for new data.
+    """
+
+    def __init__(self, keys, capacity=3600):
+        self.keys = list(keys)
+        self.capacity = capacity
+        self.columns = {key: [None] * capacity for key in self.keys}
+        # total number of samples ever appended
+        self.count = 0
+        self.new_data = threading.Condition()
+
+    def append(self, sample: dict):
+        slot = self.count % self.capacity
+        for key in self.keys:
+            self.columns[key][slot] = sample.get(key)
+        with self.new_data:
+            self.count += 1
+            self.new_data.notify_all()
+
+    def cursor(self, latest_only=False):
+        """New consumer cursor, starting at the oldest sample still held (or at the next one)."""
+        start = self.count if latest_only else max(0, self.count - self.capacity)
+        return SampleCursor(self, start)
+
+    def _slice(self, key, start, end):
+        column = self.columns[key]
+        a, b = start % self.capacity, end % self.capacity
+        if end - start == self.capacity or (end > start and b <= a):
+            return column[a:] + column[:b]
+        return column[a:b]
+
+
+class SampleCursor:
+    def __init__(self, buffer: SampleBuffer, position: int):
+        self.buffer = buffer
+        self.position = position
+        # samples overwritten before this cursor read them
+        self.dropped = 0
+
+    def pending(self) -> int:
+        return self.buffer.count - self.position
+
+    def read(self) -> dict:
+        """{key: [values]} of the samples appended since the last read."""
+        buf = self.buffer
+        end = buf.count
+        start = max(self.position, end - buf.capacity)
+        new = {key: buf._slice(key, start, end) for key in buf.keys}
+
+        # the producer may be filling slot `count` (overwriting the oldest
+        # one) while we copy; anything older than that is not trustworthy
+        oldest = buf.count + 1 - buf.capacity
+        if oldest > start:
+            skip = min(oldest - start, end - start)
+            new = {key: values[skip:] for key, values in new.items()}
+            start += skip
+
+        self.dropped += start - self.position
+        self.position = end
+        return new
+
+    def wait(self, timeout=None) -> bool:
+        """Block until there are unread samples. Returns False on timeout."""
+        with self.buffer.new_data:
+            return self.buffer.new_data.wait_for(lambda: self.pending() > 0, timeout)
@@ -253,16 +253,43 @@ class CTC100Device:
         """
         Read the setpoint value of an output channel.
 
-        :param channel: Output channel number (1 or 2).
+        :param channel: Output channel number (1 or 2) or name.
         :return: Setpoint value.
         """
-        response = self.get_variable(f"Out{channel}.PID.Setpoint")
+        if not isinstance(channel, str):
+            channel = f"Out{channel}"
+        response = self.get_variable(f"{channel}.PID.Setpoint")
         match = re.search(r"[-+]?\d*\.\d+(?:[eE][-+]?\d+)?",
                           response.decode("utf-8"))
         if match is not None:
             return float(match.group())
         else:
-            raise RuntimeError(f"Unable to read setpoint from Out{channel}")
+            raise RuntimeError(f"Unable to read setpoint from {channel}")
+
+    def read_PID_mode(self, channel):
+        """
+        Read the PID mode of an output channel.
+
+        :param channel: Output channel number (1 or 2) or name.
+        :return: PID mode ('Off', 'On' or 'Follow').
+        """
+        if not isinstance(channel, str):
+            channel = f"Out{channel}"
+        response = self.get_variable(f"{channel}.PID.Mode").decode().strip()
+        match = re.search(r"\b(Off|On|Follow)\b", response)
+        if match is not None:
+            return match.group(1)
+        else:
+            raise RuntimeError(f"Unable to read PID mode from {channel}")
+
+    def get_output(self, channel):
+        """
+        Read the present value of an output (heater) channel.
+
+        :param channel: Output channel name.
+        :return: Heater output value.
+        """
+        return self.read(channel)
 
     def tune_PID(self, channel, StepY, Lag):
         """
@@ -1,10 +1,12 @@
 # algorithm.py
 import time
+import threading
 from threading import Thread, Event
-from dataclasses import dataclass
+from dataclasses import dataclass, field, asdict
 from typing import Optional
 
 from controller_server import DeviceControllerServer
+from conditions import ReadingWatch, below, all_of, any_of, stable
 
 # ---------------- Side config ----------------
 @dataclass
@@ -18,6 +20,16 @@ class SideConfig:
     switch_3swheat: float = 7.0
     switch_4swheat: float = 7.0
 
+    # Optional thresholds (K). When set and live readings are available, a
+    # step ends as soon as its condition is met; the step's t_* value then
+    # acts as a timeout.
+    switch_cold: Optional[float] = None     # both switches below -> heaters on
+    he4_head_cold: Optional[float] = None   # 4He head below -> 4He switch on
+    he3_head_cold: Optional[float] = None   # 3He head below -> 3He switch on
+    t_min_step: int = 60                    # never end a step before this
+    # also end a threshold step once the watched head has stopped changing
+    end_on_plateau: bool = False
+
 # ---------------- Pre-cooling config ----------------
 @dataclass
 class PreCoolingConfig:
@@ -27,19 +39,116 @@ class PreCoolingConfig:
 # ---------------- Algorithm config ----------------
 @dataclass
 class AlgorithmConfig:
-    A: SideConfig = SideConfig()
-    B: SideConfig = SideConfig()
+    A: SideConfig = field(default_factory=SideConfig)
+    B: SideConfig = field(default_factory=SideConfig)
+
+    initial_precool: PreCoolingConfig = field(
+        default_factory=lambda: PreCoolingConfig(enabled=False, value=50.0)
+    )
 
-    initial_precool: PreCoolingConfig = PreCoolingConfig(
-        enabled=False,
-        value=50.0
+    pre_cycle_cool: PreCoolingConfig = field(
+        default_factory=lambda: PreCoolingConfig(enabled=False, value=7.0)
     )
 
-    pre_cycle_cool: PreCoolingConfig = PreCoolingConfig(
-        enabled=False,
-        value=7.0
+def config_from_dict(data: dict) -> AlgorithmConfig:
+    """Rebuild an AlgorithmConfig from dataclasses.asdict() output."""
+    return AlgorithmConfig(
+        A=SideConfig(**data["A"]),
+        B=SideConfig(**data["B"]),
+        initial_precool=PreCoolingConfig(**data["initial_precool"]),
+        pre_cycle_cool=PreCoolingConfig(**data["pre_cycle_cool"]),
     )
 
+# ---------------- Step plan ----------------
+# Each side runs these steps in order; the last one is the wait before the
+# other side starts.
+SIDE_STEPS = 5
+
+def side_step_plan(side_name: str, c: SideConfig, index: int):
+    """
+    Returns (label, commands, condition, duration) for one step of a side.
+    commands are (channel, controller_method, value) tuples; duration is
+    None for a step without a wait.
+    """
+    side = side_name[-1]  # "CTC100A" -> "A"
+
+    if index == 0:
+        condition = None
+        if c.switch_cold is not None:
+            condition = all_of(
+                below(f"4switch{side}", c.switch_cold),
+                below(f"3switch{side}", c.switch_cold)
+            )
+        return (
+            f"{side_name}: switches off",
+            [("4swheat", "turn_off_switch", None),
+             ("3swheat", "turn_off_switch", None)],
+            condition,
+            c.t_switches_off
+        )
+    if index == 1:
+        condition = None
+        if c.he4_head_cold is not None:
+            condition = below(f"4HePot{side}", c.he4_head_cold)
+            if c.end_on_plateau:
+                condition = any_of(condition, stable(f"4HePot{side}"))
+        return (
+            f"{side_name}: heaters on",
+            [("4puheat", "set_heater_temperature", c.heater_4puheat),
+             ("3puheat", "set_heater_temperature", c.heater_3puheat)],
+            condition,
+            c.t_heaters_on
+        )
+    if index == 2:
+        condition = None
+        if c.he3_head_cold is not None:
+            condition = below(f"3HePot{side}", c.he3_head_cold)
+            if c.end_on_plateau:
+                condition = any_of(condition, stable(f"3HePot{side}"))
+        return (
+            f"{side_name}: 4puheat off, 4swheat on",
+            [("4puheat", "turn_off_heater", None),
+             ("4swheat", "set_switch_voltage", c.switch_4swheat)],
+            condition,
+            c.t_switch_on
+        )
+    if index == 3:
+        # no timed wait
+        return (
+            f"{side_name}: 3puheat off, 3swheat on",
+            [("3puheat", "turn_off_heater", None),
+             ("3swheat", "set_switch_voltage", c.switch_3swheat)],
+            None,
+            None
+        )
+    if index == 4:
+        return ("Sleeping between sides", [], None, c.t_between_sides)
+    raise IndexError(f"No step {index}")
+
+def expected_states(side_name: str, c: SideConfig, index: int) -> dict:
+    """Channel -> ("on", value) / ("off", None) once steps 0..index have run."""
+    states = {}
+    for i in range(index + 1):
+        _, commands, _, _ = side_step_plan(side_name, c, i)
+        for channel, _, value in commands:
+            states[channel] = ("on", value) if value is not None else ("off", None)
+    return states
+
+# ---------------- Clock ----------------
+class WallClock:
+    """Real time. Cycle takes any object with time() and sleep(seconds)."""
+
+    def time(self) -> float:
+        return time.time()
+
+    def sleep(self, seconds: float):
+        time.sleep(seconds)
+
+    def wait(self, changed: threading.Condition, seconds: float):
+        """Sleep up to seconds, waking early when `changed` is notified."""
+        with changed:
+            changed.wait(seconds)
+
 # ---------------- Cycle thread ----------------
 class Cycle(Thread):
     def __init__(
@@ -47,38 +156,87 @@ class Cycle(Thread):
         controller: DeviceControllerServer,
         config: AlgorithmConfig,
         last_values: dict,
-        last_states: dict
+        last_states: dict,
+        clock=None,
+        readings: Optional[ReadingWatch] = None,
+        checkpoint=None,
+        resume: Optional[dict] = None
     ):
         super().__init__(daemon=True)
         self.controller = controller
+        self.clock = clock if clock is not None else WallClock()
+        # live readings for condition-driven steps (None -> fixed timers)
+        self.readings = readings
         self.config = config
         self.last_values = last_values
         self.last_states = last_states
         self.stop_event = Event()
 
+        # optional CycleCheckpoint saved on every step transition
+        self.checkpoint = checkpoint
+        # checkpoint dict to continue from instead of starting at A/step 0
+        self.resume = resume
+
         self.state = "Idle"
         self.step_start: Optional[float] = None
         self.step_total: int = 1
+        self.step_index: Optional[int] = None
         self.current_side: Optional[str] = None
 
     def stop(self):
         self.stop_event.set()
 
     # ---------------- Step handling ----------------
-    def set_step(self, state: str, duration: Optional[int]):
+    def set_step(self, state: str, duration: Optional[int],
+                 index: Optional[int] = None, elapsed: float = 0.0):
         self.state = state
-        self.step_start = time.time()
+        self.step_start = self.clock.time() - elapsed
         self.step_total = duration if duration is not None else 1
+        self.step_index = index
+
+        if self.checkpoint is not None and index is not None:
+            self.checkpoint.save({
+                "side": self.current_side,
+                "step": index,
+                "state": state,
+                "step_start": self.step_start,
+                "config": asdict(self.config),
+            })
 
     # ---------------- Interruptible sleep ----------------
     def sleep(self, seconds: int) -> bool:
-        end = time.time() + seconds
-        while time.time() < end:
+        end = self.clock.time() + seconds
+        while self.clock.time() < end:
             if self.stop_event.is_set():
                 return False
-            time.sleep(0.5)
+            self.clock.sleep(0.5)
         return True
 
+    # ---------------- Condition wait ----------------
+    def wait_until(self, condition, timeout: int, min_time: int = 0) -> bool:
+        """
+        Wait until condition(latest readings) is met, at most `timeout`
+        seconds and at least `min_time`. Falls back to a fixed sleep when
+        there is no condition or no reading stream. Returns False if stopped.
+        """
+        if condition is None or self.readings is None:
+            return self.sleep(timeout)
+
+        start = self.clock.time()
+        while True:
+            if self.stop_event.is_set():
+                return False
+            elapsed = self.clock.time() - start
+            if elapsed >= min_time and self.readings.check(condition, self.clock.time()):
+                print(f"[Cycle] Condition met after {elapsed:.0f} s: "
+                      f"{getattr(condition, 'description', '')}")
+                return True
+            if elapsed >= timeout:
+                print(f"[Cycle] Condition timed out after {timeout} s: "
+                      f"{getattr(condition, 'description', '')}")
+                return True
+            self.clock.wait(self.readings.changed, min(0.5, timeout - elapsed))
+
     # ---------------- Send command with retries ----------------
     def send_and_update(self, device, channel, cmd_func, value=None, retries=3):
         for attempt in range(1, retries + 1):
@@ -97,117 +255,76 @@ class Cycle(Thread):
                     f"[Cycle] Attempt {attempt} failed "
                     f"for {device}:{channel} -> {e}"
                 )
-                time.sleep(0.2)
+                self.clock.sleep(0.2)
         return False
 
     # ---------------- Run one side ----------------
-    def run_side(self, side_name: str, c: SideConfig) -> bool:
+    def run_side(self, side_name: str, c: SideConfig,
+                 start_step: int = 0, elapsed: float = 0.0) -> bool:
+        """
+        Run the steps of one side from start_step. `elapsed` is the time
+        already spent in start_step (when resuming from a checkpoint).
+        """
         self.current_side = side_name
 
-        # Switches off
-        self.set_step(f"{side_name}: switches off", c.t_switches_off)
-        if not self.send_and_update(
-            side_name, "4swheat",
-            self.controller.turn_off_switch
-        ):
-            return False
-        if not self.send_and_update(
-            side_name, "3swheat",
-            self.controller.turn_off_switch
-        ):
-            return False
-        if not self.sleep(c.t_switches_off):
-            return False
-
-        # Heaters on
-        self.set_step(f"{side_name}: heaters on", c.t_heaters_on)
-        if not self.send_and_update(
-            side_name, "4puheat",
-            self.controller.set_heater_temperature,
-            c.heater_4puheat
-        ):
-            return False
-        if not self.send_and_update(
-            side_name, "3puheat",
-            self.controller.set_heater_temperature,
-            c.heater_3puheat
-        ):
-            return False
-        if not self.sleep(c.t_heaters_on):
-            return False
-
-        # 4puheat off, 4swheat on
-        self.set_step(
-            f"{side_name}: 4puheat off, 4swheat on",
-            c.t_switch_on
-        )
-        if not self.send_and_update(
-            side_name, "4puheat",
-            self.controller.turn_off_heater
-        ):
-            return False
-        if not self.send_and_update(
-            side_name, "4swheat",
-            self.controller.set_switch_voltage,
-            c.switch_4swheat
-        ):
-            return False
-        if not self.sleep(c.t_switch_on):
-            return False
-
-        # 3puheat off, 3swheat on (no timed wait)
-        self.set_step(
-            f"{side_name}: 3puheat off, 3swheat on",
-            None
-        )
-        if not self.send_and_update(
-            side_name, "3puheat",
-            self.controller.turn_off_heater
-        ):
-            return False
-        if not self.send_and_update(
-            side_name, "3swheat",
-            self.controller.set_switch_voltage,
-            c.switch_3swheat
-        ):
-            return False
+        for index in range(start_step, SIDE_STEPS):
+            label, commands, condition, duration = side_step_plan(side_name, c, index)
+            offset = elapsed if index == start_step else 0.0
+            self.set_step(label, duration, index, offset)
+
+            # commands are idempotent, so resuming re-sends them safely
+            for channel, method, value in commands:
+                if not self.send_and_update(
+                    side_name, channel,
+                    getattr(self.controller, method),
+                    value
+                ):
+                    return False
+
+            if duration is None:
+                continue
+            if not self.wait_until(
+                condition,
+                max(0.0, duration - offset),
+                max(0.0, c.t_min_step - offset)
+            ):
+                return False
 
         return True
 
     # ---------------- Main loop ----------------
     def run(self):
+        sides = [("CTC100A", self.config.A), ("CTC100B", self.config.B)]
+        names = [name for name, _ in sides]
+
+        start_side, start_step, elapsed = 0, 0, 0.0
+        if self.resume is not None:
+            start_side = names.index(self.resume["side"])
+            start_step = self.resume["step"]
+            elapsed = max(0.0, self.clock.time() - self.resume["step_start"])
+            print(f"[Cycle] Resuming {self.resume['state']} after {elapsed:.0f} s")
+
         print("[Cycle] Algorithm started")
         try:
             while not self.stop_event.is_set():
-                if not self.run_side("CTC100A", self.config.A):
-                    break
-
-                self.set_step(
-                    "Sleeping between sides",
-                    self.config.A.t_between_sides
-                )
-                if not self.sleep(self.config.A.t_between_sides):
-                    break
-
-                if not self.run_side("CTC100B", self.config.B):
-                    break
-
-                self.set_step(
-                    "Sleeping between sides",
-                    self.config.B.t_between_sides
-                )
-                if not self.sleep(self.config.B.t_between_sides):
-                    break
+                for side_name, c in sides[start_side:]:
+                    if not self.run_side(side_name, c, start_step, elapsed):
+                        return
+                    start_step, elapsed = 0, 0.0
+                start_side = 0
         finally:
             self.set_step("Stopped", None)
             self.current_side = None
+            # a stopped cycle must not be offered for resume
+            if self.checkpoint is not None:
+                self.checkpoint.clear()
             print("[Cycle] Algorithm stopped")
 
     # ---------------- Status API ----------------
     def get_status(self):
         elapsed = 0.0
         if self.step_start is not None:
-            elapsed = time.time() - self.step_start
+            elapsed = self.clock.time() - self.step_start
 
         return {
             "running": self.is_alive() and not self.stop_event.is_set(),
@@ -0,0 +1,79 @@
+import threading
+from collections import deque
+
+class _PendingCommand:
+    def __init__(self, send, coalesce: bool):
+        self.send = send
+        self.coalesce = coalesce
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+    def finish(self, result=None, error=None):
+        self.result = result
+        self.error = error
+        self.done.set()
+
+class CommandCoalescer:
+    """
+    Per-target command queue that collapses bursts of setpoints.
+
+    Commands are submitted with a target key, e.g. (device, channel). While a
+    command for a target is being sent, new commands for the same target are
+    queued. A new command replaces any queued coalescible command (a setpoint)
+    for that target, so only the latest pending value is sent. Commands
+    submitted with coalesce=False (off/safety commands) are never dropped and
+    are sent in order.
+
+    submit() blocks until its command has been sent, returning the result of
+    send(). A command that was replaced before being sent returns False.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.queues = {}    # key -> deque of _PendingCommand
+        self.active = set() # keys with a thread currently sending
+
+    def submit(self, key, send, coalesce=True):
+        cmd = _PendingCommand(send, coalesce)
+
+        with self.lock:
+            queue = self.queues.setdefault(key, deque())
+
+            # drop queued setpoints this command supersedes
+            kept = deque()
+            for pending in queue:
+                if pending.coalesce:
+                    pending.finish(result=False)
+                else:
+                    kept.append(pending)
+            kept.append(cmd)
+            self.queues[key] = kept
+
+            leader = key not in self.active
+            if leader:
+                self.active.add(key)
+
+        # First caller for a target drains its queue, everyone else waits
+        if leader:
+            self._drain(key)
+
+        cmd.done.wait()
+        if cmd.error is not None:
+            raise cmd.error
+        return cmd.result
+
+    def _drain(self, key):
+        while True:
+            with self.lock:
+                queue = self.queues.get(key)
+                if not queue:
+                    self.queues.pop(key, None)
+                    self.active.discard(key)
+                    return
+                cmd = queue.popleft()
+
+            try:
+                cmd.finish(result=cmd.send())
+            except Exception as e:
+                cmd.finish(error=e)
@@ -0,0 +1,108 @@
+import threading
+import time
+
+from trend import TrendSet
+
+# ---------------- Conditions ----------------
+# A condition is a callable taking the latest readings {channel: value} and
+# the TrendSet of those channels, returning True once it is met. Channels use
+# the clean plot names ("4switchA", "4HePotA", "MC", ...). Missing (or
+# stale, see ReadingWatch.max_age) channels never satisfy a condition.
+
+def below(channel, threshold):
+    def condition(latest, trends=None):
+        value = latest.get(channel)
+        return value is not None and value < threshold
+    condition.description = f"{channel} < {threshold}"
+    return condition
+
+def above(channel, threshold):
+    def condition(latest, trends=None):
+        value = latest.get(channel)
+        return value is not None and value > threshold
+    condition.description = f"{channel} > {threshold}"
+    return condition
+
+def all_of(*conditions):
+    def condition(latest, trends=None):
+        return all(c(latest, trends) for c in conditions)
+    condition.description = " and ".join(getattr(c, "description", "?") for c in conditions)
+    return condition
+
+def any_of(*conditions):
+    def condition(latest, trends=None):
+        return any(c(latest, trends) for c in conditions)
+    condition.description = " or ".join(getattr(c, "description", "?") for c in conditions)
+    return condition
+
+def stable(channel):
+    """Met once the channel's windowed slope is within the trend tolerance."""
+    def condition(latest, trends=None):
+        if channel not in latest:
+            return False
+        estimator = trends.get(channel) if trends is not None else None
+        return estimator is not None and estimator.stable
+    condition.description = f"{channel} stable"
+    return condition
+
+# ---------------- Reading watch ----------------
+class ReadingWatch:
+    """
+    Latest value of every channel, updated from the reading stream.
+
+    update() is called once per reading set (LiveReader, DBReader or the
+    simulation) and wakes everything waiting on `changed`, so a waiting step
+    re-checks its condition as soon as new data arrives instead of polling.
+    Every value also feeds a per-channel TrendEstimator (`trends`), which the
+    plot legends read their gradients from.
+
+    Conditions only see channels whose last reading is at most `max_age`
+    seconds old, so a stopped stream (DB down, hardware host restarting)
+    cannot complete steps on stale temperatures.
+    """
+
+    def __init__(self, max_age=60.0, **trend_options):
+        self.changed = threading.Condition()
+        self.latest = {}
+        self.stamps = {}  # channel -> time of its last reading (unix s)
+        self.max_age = max_age
+        self.trends = TrendSet(**trend_options)
+        self.time = None
+
+    def update(self, t, named_values):
+        with self.changed:
+            values = {}
+            for name, raw in named_values.items():
+                try:
+                    value = float(raw)
+                except (TypeError, ValueError):
+                    continue
+                if value < -9:
+                    continue
+                values[name.replace(" [K]", "")] = value
+            self.latest.update(values)
+            stamp = t.timestamp() if hasattr(t, "timestamp") else t
+            for name in values:
+                self.stamps[name] = stamp
+            self.trends.update(t, values)
+            self.time = t
+            self.changed.notify_all()
+
+    def trend(self, channel):
+        """snapshot() of the channel's TrendEstimator, or None."""
+        with self.changed:
+            estimator = self.trends.get(channel)
+            return estimator.snapshot() if estimator is not None else None
+
+    def fresh(self, now=None):
+        """Latest values no older than max_age at `now` (default: wall clock)."""
+        if now is None:
+            now = time.time()
+        with self.changed:
+            return {ch: v for ch, v in self.latest.items()
+                    if now - self.stamps[ch] <= self.max_age}
+
+    def check(self, condition, now=None):
+        latest = self.fresh(now)
+        with self.changed:
+            return condition(latest, self.trends)
@@ -1,5 +1,6 @@
 # controller.py (inside webserver/)
 import threading
+import time
 
 from cooldown_loop_dilution_v2 import switch_on, switch_off, heater_on, heater_off
 
@@ -11,48 +12,126 @@ except ImportError:
     hardware_lock = threading.Lock()
 
 class DeviceController:
-    def __init__(self, devices: dict):
+    """
+    Idempotent control layer on top of the serial devices.
+
+    Every successful write is recorded in `self.confirmed` as
+    (device, channel) -> (state, value). An "on"/set-value request that
+    would leave the device in the state it is already confirmed to be in is
+    skipped, unless force=True. Off commands are always sent: the confirmed
+    state can be wrong after a front-panel change or a failed readback, and
+    a safety "off" must reach the hardware. All set/turn_off functions
+    return True if the hardware was actually written and False if the
+    request was a no-op.
+    """
+
+    def __init__(self, devices: dict, metrics=None):
         self.devices = devices
 
-    # ---------------- Switch Functions ----------------
-    def set_switch_voltage(self, device_name, channel, voltage):
-        device = self.devices[device_name]
-        with hardware_lock:
-            switch_on(device, channel, voltage)
+        # optional Metrics recording lock wait and serial time per command
+        self.metrics = metrics
+
+        # Last confirmed device state
+        # Keys: (device, channel) -> ("on", value) or ("off", None)
+        self.confirmed = {}
 
-    def turn_off_switch(self, device_name, channel):
-        device = self.devices[device_name]
+    # ---------------- State tracking ----------------
+    def is_unchanged(self, device_name, channel, state, value=None):
+        return self.confirmed.get((device_name, channel)) == (state, value)
+
+    def _apply(self, op, device_name, channel, state, value, write, force=False):
+        """Run write() under the hardware lock unless the state is unchanged."""
+        key = (device_name, channel)
+        t_request = time.perf_counter()
         with hardware_lock:
-            switch_off(device, channel)
+            t_locked = time.perf_counter()
+            if self.metrics is not None:
+                self.metrics.observe(op, "lock_wait", t_locked - t_request)
+
+            if state == "on" and value is None:
+                # "on" without a value (heater toggle) keeps the current setpoint
+                current = self.confirmed.get(key)
+                if not force and current is not None and current[0] == "on":
+                    if self.metrics is not None:
+                        self.metrics.count(op, "skipped")
+                    return False
+                value = current[1] if current is not None else None
+            elif not force and state != "off" and self.is_unchanged(device_name, channel, state, value):
+                if self.metrics is not None:
+                    self.metrics.count(op, "skipped")
+                return False
+            try:
+                write(self.devices[device_name])
+                if self.metrics is not None:
+                    self.metrics.observe(op, "serial", time.perf_counter() - t_locked)
+            except Exception:
+                # device state is unknown after a failed write
+                self.confirmed.pop(key, None)
+                raise
+            self.confirmed[key] = (state, value)
+        return True
+
+    # ---------------- Switch Functions ----------------
+    def set_switch_voltage(self, device_name, channel, voltage, force=False):
+        return self._apply(
+            "set_switch_voltage",
+            device_name, channel, "on", voltage,
+            lambda device: switch_on(device, channel, voltage),
+            force
+        )
+
+    def turn_off_switch(self, device_name, channel, force=False):
+        return self._apply(
+            "turn_off_switch",
+            device_name, channel, "off", None,
+            lambda device: switch_off(device, channel),
+            force
+        )
 
     # ---------------- Heater Functions ----------------
-    def set_heater_temperature(self, device_name, channel, temperature):
-        device = self.devices[device_name]
-        with hardware_lock:
+    def set_heater_temperature(self, device_name, channel, temperature, force=False):
+        def write(device):
             device.write_setpoint(channel, temperature)
             heater_on(device, channel)
 
-    def turn_off_heater(self, device_name, channel):
-        device = self.devices[device_name]
-        with hardware_lock:
-            heater_off(device, channel)
+        return self._apply(
+            "set_heater_temperature",
+            device_name, channel, "on", temperature,
+            write,
+            force
+        )
 
-    def toggle_heater(self, device_name, channel, state: bool):
-        device = self.devices[device_name]
-        with hardware_lock:
-            if state:
-                heater_on(device, channel)
-            else:
-                heater_off(device, channel)
+    def turn_off_heater(self, device_name, channel, force=False):
+        return self._apply(
+            "turn_off_heater",
+            device_name, channel, "off", None,
+            lambda device: heater_off(device, channel),
+            force
+        )
 
-    # ---------------- Still Heater Functions ----------------
-    def set_still_percentage(self, device_name, channel, percent):
-        device = self.devices[device_name]
-        with hardware_lock:
-            device.set_still_voltage(percent)
+    def toggle_heater(self, device_name, channel, state: bool, force=False):
+        if not state:
+            return self.turn_off_heater(device_name, channel, force)
+        return self._apply(
+            "toggle_heater",
+            device_name, channel, "on", None,
+            lambda device: heater_on(device, channel),
+            force
+        )
 
-    def turn_off_still(self, device_name, channel):
-        device = self.devices[device_name]
-        with hardware_lock:
-            device.set_still_voltage(0)
+    # ---------------- Still Heater Functions ----------------
+    def set_still_percentage(self, device_name, channel, percent, force=False):
+        return self._apply(
+            "set_still_percentage",
+            device_name, channel, "on", percent,
+            lambda device: device.set_still_voltage(percent),
+            force
+        )
 
+    def turn_off_still(self, device_name, channel, force=False):
+        return self._apply(
+            "turn_off_still",
+            device_name, channel, "off", None,
+            lambda device: device.set_still_voltage(0),
+            force
+        )
@@ -2,24 +2,35 @@ import threading
 import socket
 import time
 import json
-from cooldown_loop_dilution_v2 import switch_on, switch_off, heater_on, heater_off
+from controller import DeviceController
+from metrics import Metrics
 from device import get_channels_for_device
 
-# If your real device_lock exists, import it.
-# Otherwise assign a new lock:
-try:
-    from devices.device import device_lock as hardware_lock
-except ImportError:
-    hardware_lock = threading.Lock()
+# Response codes sent back to DeviceControllerServer
+RESP_WRITTEN = "0"
+RESP_FAILED = "1"
+RESP_UNCHANGED = "2"
 
 class DeviceControllerClient(threading.Thread):
-    def __init__(self, devices: dict, host: str, port: int):
+    def __init__(self, devices: dict, host: str, port: int, state_reader=None, publisher=None):
         super().__init__(daemon=True)
         self.devices = devices
         self.host = host
         self.port = port
         self.stop_flag = threading.Event()
 
+        # optional DeviceStateReader serving cached readback state
+        self.state_reader = state_reader
+
+        # optional ReadingPublisher that takes over "subscribe" connections
+        self.publisher = publisher
+
+        # latency/failure instrumentation, served by get_metrics
+        self.metrics = Metrics()
+
+        # all hardware writes go through the idempotent control layer
+        self.controller = DeviceController(devices, metrics=self.metrics)
+
         self.func_dict = {
             "set_switch_voltage": self.set_switch_voltage,
             "turn_off_switch": self.turn_off_switch,
@@ -29,49 +40,33 @@ class DeviceControllerClient(threading.Thread):
             "set_still_percentage": self.set_still_percentage,
             "turn_off_still": self.turn_off_still,
             "get_devices": self.get_devices,
+            "get_state": self.get_state,
+            "get_metrics": self.get_metrics,
         }
 
     # ---------------- Switch Commands ----------------
-    def set_switch_voltage(self, device_name, channel, voltage):
-        device = self.devices[device_name]
-        with hardware_lock:
-            switch_on(device, channel, voltage)
+    def set_switch_voltage(self, device_name, channel, voltage, force=False):
+        return self.controller.set_switch_voltage(device_name, channel, voltage, force)
 
-    def turn_off_switch(self, device_name, channel, _):
-        device = self.devices[device_name]
-        with hardware_lock:
-            switch_off(device, channel)
+    def turn_off_switch(self, device_name, channel, _, force=False):
+        return self.controller.turn_off_switch(device_name, channel, force)
 
     # ---------------- Heater Commands ----------------
-    def set_heater_temperature(self, device_name, channel, temperature):
-        device = self.devices[device_name]
-        with hardware_lock:
-            device.write_setpoint(channel, temperature)
-            heater_on(device, channel)
-
-    def turn_off_heater(self, device_name, channel, _):
-        device = self.devices[device_name]
-        with hardware_lock:
-            heater_off(device, channel)
-
-    def toggle_heater(self, device_name, channel, state):
-        device = self.devices[device_name]
-        with hardware_lock:
-            if state == "1":
-                heater_on(device, channel)
-            else:
-                heater_off(device, channel)
+    def set_heater_temperature(self, device_name, channel, temperature, force=False):
+        return self.controller.set_heater_temperature(device_name, channel, temperature, force)
+
+    def turn_off_heater(self, device_name, channel, _, force=False):
+        return self.controller.turn_off_heater(device_name, channel, force)
+
+    def toggle_heater(self, device_name, channel, state, force=False):
+        return self.controller.toggle_heater(device_name, channel, bool(state), force)
 
     # ---------------- Still Heater ----------------
-    def set_still_percentage(self, device_name, channel, percent):
-        device = self.devices[device_name]
-        with hardware_lock:
-            device.set_still_voltage(percent)
+    def set_still_percentage(self, device_name, channel, percent, force=False):
+        return self.controller.set_still_percentage(device_name, channel, percent, force)
 
-    def turn_off_still(self, device_name, channel, _):
-        device = self.devices[device_name]
-        with hardware_lock:
-            device.set_still_voltage(0)
+    def turn_off_still(self, device_name, channel, _, force=False):
+        return self.controller.turn_off_still(device_name, channel, force)
 
     # ---------------- Device List ----------------
     def get_devices(self, *_ignored):
@@ -83,6 +78,16 @@ class DeviceControllerClient(threading.Thread):
             }
         return json.dumps(result)
 
+    # ---------------- Device State ----------------
+    def get_state(self, *_ignored):
+        if self.state_reader is None:
+            return json.dumps({"time": None, "devices": {}})
+        return json.dumps(self.state_reader.get_state())
+
+    # ---------------- Metrics ----------------
+    def get_metrics(self, *_ignored):
+        return json.dumps(self.metrics.snapshot())
+
     # --------------- Command Dispatch ---------------
     def handle_cmd(self, cmd_str: str):
         parts = cmd_str.strip().split()
@@ -90,24 +95,28 @@ class DeviceControllerClient(threading.Thread):
 
         if cmd_func not in self.func_dict:
             print(f"[Client] Unknown command: {cmd_func}")
-            return "1"
+            return RESP_FAILED
 
         func = self.func_dict[cmd_func]
 
-        # Special-case: get_devices takes no args
-        if cmd_func == "get_devices":
+        # Special-case: query commands take no args
+        if cmd_func in ("get_devices", "get_state", "get_metrics"):
             return func()
 
-        if len(parts) != 4:
+        # optional trailing "force" bypasses the unchanged-state check
+        force = len(parts) == 5 and parts[4] == "force"
+        if len(parts) != 4 and not force:
             print("[Client] Invalid command format")
-            return "1"
+            return RESP_FAILED
 
-        device_name, channel, value = parts[1:]
+        device_name, channel, value = parts[1:4]
         if value != "_":
             value = float(value)
-        func(device_name, channel, value)
+        written = func(device_name, channel, value, force=force)
+        if written and self.state_reader is not None:
+            self.state_reader.refresh()
 
-        return "0"
+        return RESP_WRITTEN if written else RESP_UNCHANGED
 
     # --------------- Thread Loop ----------------
     def run(self):
@@ -124,13 +133,24 @@ class DeviceControllerClient(threading.Thread):
                 except socket.timeout:
                     continue
 
+                cmd = conn.recv(1024).decode("ascii")
+                print("[Client] Received:", cmd)
+
+                # live reading stream: the publisher now owns the connection
+                if cmd.strip().startswith("subscribe") and self.publisher is not None:
+                    self.publisher.add_subscriber(conn)
+                    continue
+
                 with conn:
-                    cmd = conn.recv(1024).decode("ascii")
-                    print("[Client] Received:", cmd)
+                    cmd_name = cmd.split()[0] if cmd.split() else "empty"
+                    start = time.perf_counter()
                     try:
                         result = self.handle_cmd(cmd)
                     except Exception as e:
                         print(f"[Client] ERROR: {e}")
-                        result = "1"
+                        result = RESP_FAILED
+                    self.metrics.observe(cmd_name, "handle", time.perf_counter() - start)
+                    if result == RESP_FAILED:
+                        self.metrics.count(cmd_name, "failures")
                     conn.sendall(result.encode("ascii"))
 
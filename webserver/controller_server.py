@@ -2,44 +2,62 @@ import socket
 import time
 import json
 
+from coalescer import CommandCoalescer
+from metrics import Metrics
+
 MAX_RETRIES = 3
 RETRY_DELAY = 0.1  # seconds
 
+# Response codes from DeviceControllerClient
+RESP_WRITTEN = "0"
+RESP_FAILED = "1"
+RESP_UNCHANGED = "2"
+
 class DeviceControllerServer:
     def __init__(self, host: str, port: int):
         self.host = host
         self.port = port
 
+        # collapses bursts of setpoints per (device, channel)
+        self.coalescer = CommandCoalescer()
+
+        # round-trip latency, retries and failures per command
+        self.metrics = Metrics()
+
     # ---------------- Switch Functions ----------------
-    def set_switch_voltage(self, device_name, channel, voltage):
+    # Each set/turn_off function returns True if the hardware was written and
+    # False if the device was already in the requested state (or the setpoint
+    # was replaced by a newer one before it was sent). Pass force=True to
+    # write regardless.
+    def set_switch_voltage(self, device_name, channel, voltage, force=False):
         cmd_str = f"set_switch_voltage {device_name} {channel} {voltage}"
-        self.send_cmd_with_retry(cmd_str)
+        return self.send_target_cmd(device_name, channel, cmd_str, force, coalesce=True)
 
-    def turn_off_switch(self, device_name, channel):
+    def turn_off_switch(self, device_name, channel, force=False):
         cmd_str = f"turn_off_switch {device_name} {channel} _"
-        self.send_cmd_with_retry(cmd_str)
+        return self.send_target_cmd(device_name, channel, cmd_str, force, coalesce=False)
 
     # ---------------- Heater Functions ----------------
-    def set_heater_temperature(self, device_name, channel, temperature):
+    def set_heater_temperature(self, device_name, channel, temperature, force=False):
         cmd_str = f"set_heater_temperature {device_name} {channel} {temperature}"
-        self.send_cmd_with_retry(cmd_str)
+        return self.send_target_cmd(device_name, channel, cmd_str, force, coalesce=True)
 
-    def turn_off_heater(self, device_name, channel):
+    def turn_off_heater(self, device_name, channel, force=False):
         cmd_str = f"turn_off_heater {device_name} {channel} _"
-        self.send_cmd_with_retry(cmd_str)
+        return self.send_target_cmd(device_name, channel, cmd_str, force, coalesce=False)
 
-    def toggle_heater(self, device_name, channel, state: bool):
-        cmd_str = f"toggle_heater {device_name} {channel} {state}"
-        self.send_cmd_with_retry(cmd_str)
+    def toggle_heater(self, device_name, channel, state: bool, force=False):
+        cmd_str = f"toggle_heater {device_name} {channel} {int(bool(state))}"
+        return self.send_target_cmd(device_name, channel, cmd_str, force, coalesce=bool(state))
 
     # ---------------- Still Heater Functions ----------------
-    def set_still_percentage(self, device_name, channel, percent):
+    def set_still_percentage(self, device_name, channel, percent, force=False):
         cmd_str = f"set_still_percentage {device_name} {channel} {percent}"
-        self.send_cmd_with_retry(cmd_str)
+        return self.send_target_cmd(device_name, channel, cmd_str, force, coalesce=True)
 
-    def turn_off_still(self, device_name, channel):
+    def turn_off_still(self, device_name, channel, force=False):
         cmd_str = f"turn_off_still {device_name} {channel} _"
-        self.send_cmd_with_retry(cmd_str)
+        return self.send_target_cmd(device_name, channel, cmd_str, force, coalesce=False)
     
     # --------------- Device List Functions -----------------
     def get_devices(self):
@@ -47,13 +65,30 @@ class DeviceControllerServer:
         json_str = self.send_cmd(cmd_str)
         return json.loads(json_str)
 
+    # --------------- Device State Functions -----------------
+    def get_state(self):
+        """Cached readback of the actual device state from the hardware host."""
+        cmd_str = f"get_state _ _ _"
+        json_str = self.send_cmd(cmd_str)
+        return json.loads(json_str)
+
+    # --------------- Metrics Functions -----------------
+    def get_metrics(self):
+        """Latency/failure metrics recorded on the hardware host."""
+        cmd_str = f"get_metrics _ _ _"
+        json_str = self.send_cmd(cmd_str)
+        return json.loads(json_str)
+
     # --------------- Remote Functions -----------------
     def send_cmd(self, cmd: str):
         '''
         Send an ASCII command and wait for an ASCII response.
         Returns the response string.
         '''
-        with socket.socket() as s:
+        cmd_name = cmd.split()[0]
+        # socket round trip, including handling on the hardware host; also
+        # recorded when the command times out or the host is unreachable
+        with self.metrics.timer(cmd_name, "round_trip"), socket.socket() as s:
             # avoid infinite wait
             s.settimeout(2.0)
 
@@ -63,24 +98,47 @@ class DeviceControllerServer:
             # Send command
             s.sendall((cmd + "\n").encode("ascii"))
 
-            # Wait for response
-            response = s.recv(1024).decode("ascii").strip()
-            
-            if response == "1":
+            # Wait for response (read until the client closes the connection)
+            chunks = []
+            while True:
+                chunk = s.recv(4096)
+                if not chunk:
+                    break
+                chunks.append(chunk)
+            response = b"".join(chunks).decode("ascii").strip()
+
+            if response == RESP_FAILED:
                 raise ValueError(f"Command failed to send '{cmd}'")
 
         return response
 
-    def send_cmd_with_retry(self, cmd: str):
-        """Try to send the command up to MAX_RETRIES times before failing."""
+    def send_target_cmd(self, device_name, channel, cmd: str, force=False, coalesce=True):
+        """Send a command for one (device, channel) through the coalescer."""
+        return self.coalescer.submit(
+            (device_name, channel),
+            lambda: self.send_cmd_with_retry(cmd, force),
+            coalesce=coalesce
+        )
+
+    def send_cmd_with_retry(self, cmd: str, force=False):
+        """
+        Try to send the command up to MAX_RETRIES times before failing.
+        Returns True if the hardware was written, False if it was unchanged.
+        """
+        if force:
+            cmd = cmd + " force"
         for attempt in range(1, MAX_RETRIES + 1):
             try:
-                self.send_cmd(cmd)
-                return  # Success
-            except ValueError as e:
+                response = self.send_cmd(cmd)
+                return response != RESP_UNCHANGED  # Success
+            except (ValueError, OSError) as e:
+                # OSError covers socket timeouts and an unreachable host
+                cmd_name = cmd.split()[0]
                 if attempt == MAX_RETRIES:
+                    self.metrics.count(cmd_name, "failures")
                     raise  # Re-raise after last attempt
                 else:
-                    print(f"[Controller] Command failed, retry {attempt}/{MAX_RETRIES}: {cmd}")
+                    self.metrics.count(cmd_name, "retries")
+                    print(f"[Controller] Command failed ({e}), retry {attempt}/{MAX_RETRIES}: {cmd}")
                     time.sleep(RETRY_DELAY)
 
@@ -0,0 +1,48 @@
+import json
+import os
+import threading
+import time
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cycle_checkpoint.json")
+
+class CycleCheckpoint:
+    """
+    Small local store for the running Cycle's position.
+
+    Cycle.set_step() saves {side, step, state, step_start, config} on every
+    transition; the file is replaced atomically so a crash never leaves a
+    half-written checkpoint. A stopped Cycle clears it, so a checkpoint found
+    at startup means the previous web process died mid-cycle.
+    """
+
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def save(self, data: dict):
+        data = dict(data, saved_at=time.time())
+        tmp = self.path + ".tmp"
+        with self._lock:
+            with open(tmp, "w") as f:
+                json.dump(data, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.path)
+
+    def load(self):
+        with self._lock:
+            try:
+                with open(self.path) as f:
+                    return json.load(f)
+            except FileNotFoundError:
+                return None
+            except (OSError, ValueError) as e:
+                print("[Checkpoint] Ignoring unreadable checkpoint:", e)
+                return None
+
+    def clear(self):
+        with self._lock:
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
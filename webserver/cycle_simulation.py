@@ -0,0 +1,111 @@
+"""
+Accelerated-time simulation of algorithm.Cycle.
+
+A Cycle is run against a DeviceController driving the simulated devices,
+with a SimClock in place of wall-clock time, so hours of cycling take
+seconds. The fridge trace is sampled from the FridgeModel as virtual time
+advances.
+
+    trace = simulate_cycle(AlgorithmConfig(), duration=12 * 3600)
+    trace["time"], trace["MC"], trace["state"], ...
+"""
+import threading
+import time
+
+from algorithm import Cycle, AlgorithmConfig
+from controller import DeviceController
+from simulated_devices import FridgeModel, connect_simulated_devices
+from conditions import ReadingWatch
+
+class SimClock:
+    """
+    Virtual clock for Cycle and FridgeModel.
+
+    sleep() advances virtual time immediately. With speed set, it also sleeps
+    seconds / speed of real time (e.g. speed=1000 for a watchable 1000x run);
+    speed=None runs as fast as possible. Listeners are called with the new
+    time after every advance.
+    """
+
+    def __init__(self, start=0.0, speed=None):
+        self.now = start
+        self.speed = speed
+        self.listeners = []
+
+    def time(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float):
+        if self.speed:
+            time.sleep(seconds / self.speed)
+        self.now += seconds
+        for listener in self.listeners:
+            listener(self.now)
+
+    def wait(self, changed: threading.Condition, seconds: float):
+        # readings only change when virtual time advances
+        self.sleep(seconds)
+
+class TraceRecorder:
+    """
+    Samples the FridgeModel every `interval` virtual seconds and feeds the
+    samples to the Cycle's ReadingWatch, like the live reading stream.
+    """
+
+    def __init__(self, model: FridgeModel, cycle: Cycle, interval=10.0):
+        self.model = model
+        self.cycle = cycle
+        self.interval = interval
+        self.next_sample = 0.0
+        self.trace = {"time": [], "state": []}
+
+    def __call__(self, now):
+        if now < self.next_sample:
+            return
+        self.next_sample = now + self.interval
+
+        with self.model.lock:
+            self.model.advance()
+            temps = dict(self.model.T)
+
+        if self.cycle.readings is not None:
+            self.cycle.readings.update(now, temps)
+
+        self.trace["time"].append(now)
+        self.trace["state"].append(self.cycle.state)
+        for node, value in temps.items():
+            self.trace.setdefault(node, []).append(value)
+
+def simulate_cycle(config: AlgorithmConfig, duration: float, sample_interval=10.0,
+                   speed=None, model=None):
+    """
+    Run a Cycle with `config` for `duration` virtual seconds.
+
+    Returns the trace as a dict of equal-length lists: "time" (s), "state"
+    (Cycle step name) and one list per FridgeModel node (K).
+    """
+    clock = SimClock(speed=speed)
+    if model is None:
+        model = FridgeModel(clock=clock.time)
+    devices = connect_simulated_devices(model=model, latency=0.0, jitter=0.0)
+    controller = DeviceController(devices)
+
+    cycle = Cycle(controller, config, {}, {}, clock=clock, readings=ReadingWatch())
+    recorder = TraceRecorder(model, cycle, sample_interval)
+
+    def stop_at_end(now):
+        if now >= duration:
+            cycle.stop()
+
+    clock.listeners.append(recorder)
+    clock.listeners.append(stop_at_end)
+
+    # run in this thread; the clock stops the cycle at `duration`
+    cycle.run()
+    return recorder.trace
+
+if __name__ == "__main__":
+    start = time.time()
+    trace = simulate_cycle(AlgorithmConfig(), duration=12 * 3600)
+    print(f"Simulated {trace['time'][-1] / 3600:.1f} h in {time.time() - start:.1f} s")
+    print(f"MC min {min(trace['MC']):.3f} K, final {trace['MC'][-1]:.3f} K")
@@ -0,0 +1,43 @@
+import argparse
+
+from sql import SQL
+
+# Manual upkeep of the slow control database (the hardware host also runs
+# SQL.maintain() periodically from RollupCompactor):
+#
+#   python db_maintenance.py                  partitions ahead, rollups, retention
+#   python db_maintenance.py --migrate        convert a plain slow_control_data
+#   python db_maintenance.py --dry-run        read-only: list partitions retention would drop
+#                                             (no migration, schema or rollup changes)
+
+SQL_OPTIONS = ["localhost", "axion_writer", 8082, "axion_db"]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="slow_control_data partition and retention upkeep")
+    parser.add_argument("--migrate", action="store_true", help="turn an existing plain table into a partitioned one")
+    parser.add_argument("--months-ahead", type=int, default=2, help="monthly partitions to create ahead")
+    parser.add_argument("--keep-months", type=int, default=12, help="raw data kept before rollups only (0 = keep all)")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="only report what retention would drop; changes nothing")
+    args = parser.parse_args()
+
+    sql = SQL(debug=False, options=SQL_OPTIONS)
+
+    if args.dry_run:
+        try:
+            dropped = sql.applyRetention(args.keep_months, dry_run=True) if args.keep_months else []
+            print("Would drop:", dropped or "nothing")
+        except Exception as e:
+            sql.rollback()
+            print("Retention check failed:", e)
+    else:
+        if args.migrate:
+            sql.migrateToPartitioned()
+        sql.createSchema()
+        sql.maintain(args.months_ahead, args.keep_months)
+
+    for name, lower, upper in sql.getPartitions():
+        print(f"  {name}: {lower} .. {upper}")
+    for problem in sql.validateSchema():
+        print("Schema problem:", problem)
+    sql.close()
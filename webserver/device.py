@@ -8,12 +8,20 @@ from lakeshore372device import LakeShore372Device
 # Global re-entrant lock used to synchronize access to serial devices
 device_lock = RLock()
 
-def connect_devices():
+def connect_devices(simulate=False, **sim_options):
     """Scan serial ports and construct device wrappers. Returns dict of name->device.
 
     Each returned device is expected to expose the same methods used elsewhere
     (get_temperature, write_setpoint, set_still_voltage, etc.).
+
+    With simulate=True no ports are scanned and simulated devices are returned
+    instead; sim_options (model, latency, jitter, failure_rate, sleep) are
+    passed to connect_simulated_devices().
     """
+    if simulate:
+        from simulated_devices import connect_simulated_devices
+        return connect_simulated_devices(**sim_options)
+
     devices = serial.tools.list_ports.comports()
 
     ctc100A = None
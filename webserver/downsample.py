@@ -0,0 +1,108 @@
+import math
+
+import numpy as np
+
+# ---------------- Downsampling ----------------
+# Reduce a (time, value) series to about `points` samples while keeping its
+# shape. "minmax" keeps the lowest and highest sample of each bucket (every
+# peak survives), "lttb" picks the visually most significant sample per
+# bucket (Largest-Triangle-Three-Buckets).
+
+METHODS = ("minmax", "lttb")
+
+def minmax(t, y, points):
+    n = len(y)
+    if n <= points or points < 2:
+        return t, y
+
+    size = math.ceil(n / (points // 2))
+    buckets = math.ceil(n / size)
+
+    padded = np.full(buckets * size, np.nan)
+    padded[:n] = y
+    grid = padded.reshape(buckets, size)
+
+    offsets = np.arange(buckets) * size
+    imin = offsets + np.nanargmin(grid, axis=1)
+    imax = offsets + np.nanargmax(grid, axis=1)
+
+    # keep time order inside each bucket, drop flat buckets' duplicate
+    idx = np.unique(np.concatenate([imin, imax]))
+    return t[idx], y[idx]
+
+def lttb(t, y, points):
+    n = len(y)
+    if n <= points or points < 3:
+        return t, y
+
+    every = (n - 2) / (points - 2)
+    idx = np.empty(points, dtype=int)
+    idx[0], idx[-1] = 0, n - 1
+
+    a = 0
+    for i in range(points - 2):
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, n)
+
+        # average of the next bucket is the third triangle corner
+        avg_t = t[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+
+        area = np.abs(
+            (t[a] - avg_t) * (y[start:end] - y[a])
+            - (t[a] - t[start:end]) * (avg_y - y[a])
+        )
+        a = start + int(np.argmax(area))
+        idx[i + 1] = a
+
+    return t[idx], y[idx]
+
+def downsample(times, values, points, method="minmax"):
+    """
+    Drop invalid readings (NaN, <= -9 K) and reduce to about `points`
+    samples. times are seconds; returns (times, values) as numpy arrays.
+    """
+    t = np.asarray(times, dtype=float)
+    y = np.asarray(values, dtype=float)
+    valid = np.isfinite(y) & (y > -9)
+    t, y = t[valid], y[valid]
+
+    if method == "lttb":
+        return lttb(t, y, points)
+    return minmax(t, y, points)
+
+def to_seconds(times):
+    if times and not isinstance(times[0], (int, float)):
+        return np.array([t.timestamp() for t in times])
+    return np.asarray(times, dtype=float)
+
+def downsample_snapshot(snapshot, points, window=None, method="minmax"):
+    """
+    Downsample a plot snapshot {device: {"times": [...], ch: [...]}}.
+
+    Only the last `window` seconds are kept (None = all). Channel lists may
+    be shorter than "times" (no data yet at the start) and are aligned to
+    its end. Returns {device: {ch: {"times": [s], "values": [K]}}}.
+    """
+    result = {}
+    for device, data in snapshot.items():
+        times = to_seconds(data.get("times", []))
+        if not len(times):
+            continue
+
+        first = 0
+        if window:
+            first = int(np.searchsorted(times, times[-1] - window))
+
+        channels = {}
+        for ch, values in data.items():
+            if ch == "times":
+                continue
+            values = values[len(values) - len(times):] if len(values) > len(times) else values
+            start = len(times) - len(values)
+            offset = max(0, first - start)
+            t, y = downsample(times[start + offset:], values[offset:], points, method)
+            channels[ch] = {"times": t.tolist(), "values": y.tolist()}
+        result[device] = channels
+    return result
@@ -1,4 +1,5 @@
 import time
+import queue
 import serial
 import numpy as np
 import serial.tools.list_ports
@@ -19,10 +20,16 @@ class HardwareTemperatureReader(threading.Thread):
     Only reads temperatures and returns a unified reading dict.
     """
 
-    def __init__(self, devices, sql: SQL):
+    def __init__(self, devices, sql: SQL, publisher=None, metrics=None, writer=None):
         super().__init__(daemon=True)
         self.devices = devices
         self.sql = sql
+        # optional ReadingPublisher for the live view
+        self.publisher = publisher
+        # optional Metrics for lock wait / serial read time
+        self.metrics = metrics
+        # optional DatabaseWriter; without it readings are written inline
+        self.writer = writer
         self.interval = 5.0
         self._stop_event = threading.Event()
 
@@ -30,7 +37,9 @@ class HardwareTemperatureReader(threading.Thread):
         d = self.devices
         readings = {}
 
+        t_request = time.perf_counter()
         with hardware_lock:
+            t_locked = time.perf_counter()
             # -------------------- CTC100A --------------------
             if "CTC100A" in d:
                 dev = d["CTC100A"]
@@ -72,11 +81,17 @@ class HardwareTemperatureReader(threading.Thread):
                     "Still [K]": dev.get_temperature("A"),
                 }
 
+        if self.metrics is not None:
+            self.metrics.observe("read_temperatures", "lock_wait", t_locked - t_request)
+            self.metrics.observe("read_temperatures", "serial", time.perf_counter() - t_locked)
+
         return readings
 
-    def write_temperatures_to_db(self, readings):
-        timestamp = datetime.now()
+    def write_temperatures_to_db(self, readings, timestamp=None):
+        if timestamp is None:
+            timestamp = datetime.now()
 
+        rows = []
         for device, channel_dict in readings.items():
             for name, value in channel_dict.items():
 
@@ -87,7 +102,12 @@ class HardwareTemperatureReader(threading.Thread):
                     print(f"Skipping invalid value for {name}: {value}")
                     continue
 
-                self.sql.insertSCValueByName(name, value, timestamp)
+                rows.append((name, value, timestamp))
+
+        if self.writer is not None:
+            self.writer.put(rows)
+        else:
+            self.sql.insertSCValues(rows)
 
     def stop(self):
         self._stop_event.set()
@@ -95,14 +115,204 @@ class HardwareTemperatureReader(threading.Thread):
     def run(self):
         print("[HardwareReadoutThread] Starting background temperature logging...")
 
+        # fixed cadence: ticks are scheduled from the start, not from the
+        # end of the previous cycle, so slow reads do not stretch the period
+        next_tick = time.monotonic()
         while not self._stop_event.is_set():
             try:
                 readings = self.read_temperatures()
-                self.write_temperatures_to_db(readings)
+                timestamp = datetime.now()
+
+                # live view first, the DB is the durable archive
+                if self.publisher is not None:
+                    self.publisher.publish(timestamp, readings)
+                self.write_temperatures_to_db(readings, timestamp)
             except Exception as e:
                 print("[HardwareReadoutThread] ERROR during read/write:", e)
 
+            next_tick += self.interval
+            now = time.monotonic()
+            if now > next_tick:
+                # overran: skip the missed ticks instead of reading in a burst
+                missed = int((now - next_tick) // self.interval) + 1
+                next_tick += missed * self.interval
+                if self.metrics is not None:
+                    self.metrics.count("read_temperatures", "missed_ticks", missed)
+
             # Sleep with interrupt support
-            self._stop_event.wait(self.interval)
+            self._stop_event.wait(next_tick - now)
 
         print("[HardwareReadoutThread] Stopped.")
+
+class DatabaseWriter(threading.Thread):
+    """
+    Writes readings to the database off the sampling thread.
+
+    put() queues one cycle of (name, value, timestamp) rows without
+    blocking. The writer collects rows and commits them in one bulk insert
+    once `batch_rows` are waiting or the oldest has waited `batch_interval`
+    seconds.
+
+    Backpressure: at most `max_queue` cycles are held. When the queue is
+    full, put() spills the cycle to the spool if there is one, otherwise
+    the oldest queued cycle is dropped. A write that fails or takes longer
+    than `slow_write` seconds sends batches to the spool for
+    `retry_interval` seconds. Enqueued, written, spooled and dropped rows
+    are counted in metrics under "db_writer".
+    """
+
+    def __init__(self, sql: SQL, spool=None, metrics=None, max_queue=720,
+                 batch_rows=500, batch_interval=5.0, retry_interval=30.0, slow_write=2.0):
+        super().__init__(daemon=True)
+        self.sql = sql
+        self.spool = spool
+        self.metrics = metrics
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.batch_rows = batch_rows
+        self.batch_interval = batch_interval
+        self.retry_interval = retry_interval
+        self.slow_write = slow_write
+        self.db_retry_at = 0.0
+        self._stop_event = threading.Event()
+
+    def _count(self, name, n=1):
+        if self.metrics is not None and n:
+            self.metrics.count("db_writer", name, n)
+
+    def put(self, rows):
+        """Queue one cycle of rows; False if older data had to be dropped."""
+        if not rows:
+            return True
+        try:
+            self.queue.put_nowait(rows)
+            self._count("enqueued", len(rows))
+            return True
+        except queue.Full:
+            self._count("overflow")
+
+        if self.spool is not None:
+            self.spool.append(rows)
+            self._count("spooled", len(rows))
+            return True
+
+        # keep the newest readings
+        try:
+            old = self.queue.get_nowait()
+            self._count("dropped", len(old))
+        except queue.Empty:
+            pass
+        try:
+            self.queue.put_nowait(rows)
+            self._count("enqueued", len(rows))
+        except queue.Full:
+            self._count("dropped", len(rows))
+        return False
+
+    def write(self, rows):
+        now = time.monotonic()
+        if self.spool is None or now >= self.db_retry_at:
+            if not self.sql.connected():
+                self.sql.reconnect()
+            t_start = time.perf_counter()
+            written = self.sql.connected() and self.sql.insertSCValues(rows)
+            elapsed = time.perf_counter() - t_start
+            if self.metrics is not None:
+                self.metrics.observe("db_writer", "commit", elapsed)
+            if written:
+                self._count("written", len(rows))
+                if self.spool is not None and elapsed > self.slow_write:
+                    print(f"[DatabaseWriter] Database slow ({elapsed:.1f} s), spooling for {self.retry_interval:.0f} s")
+                    self.db_retry_at = now + self.retry_interval
+                return
+            if self.spool is None:
+                self._count("dropped", len(rows))
+                return
+            print(f"[DatabaseWriter] Database unavailable, spooling for {self.retry_interval:.0f} s")
+            self.db_retry_at = now + self.retry_interval
+
+        self.spool.append(rows)
+        self._count("spooled", len(rows))
+
+    def stop(self):
+        self._stop_event.set()
+
+    def run(self):
+        print("[DatabaseWriter] Started.")
+        batch = []
+        deadline = None
+
+        # after stop(), drain what is queued before exiting
+        while not self._stop_event.is_set() or not self.queue.empty() or batch:
+            timeout = 1.0 if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                rows = self.queue.get(timeout=timeout)
+                batch.extend(rows)
+                if deadline is None:
+                    deadline = time.monotonic() + self.batch_interval
+            except queue.Empty:
+                pass
+
+            if batch and (len(batch) >= self.batch_rows or time.monotonic() >= deadline
+                          or self._stop_event.is_set()):
+                try:
+                    self.write(batch)
+                except Exception as e:
+                    print("[DatabaseWriter] ERROR during write:", e)
+                    self._count("dropped", len(batch))
+                batch = []
+                deadline = None
+
+        print("[DatabaseWriter] Stopped.")
+
+class RollupCompactor(threading.Thread):
+    """
+    Creates the schema on its first connected run (SQL.createSchema; index
+    builds on a large table can take long, so this stays off the sampling
+    path), then keeps the 1 minute / 1 hour rollup tables up to date and,
+    every `maintenance_interval` seconds, runs the partition / retention
+    upkeep (SQL.maintain). SQL gives each thread its own pooled connection, so
+    this never shares the writer's cursor.
+    """
+
+    def __init__(self, sql: SQL, interval=60.0, maintenance_interval=6 * 3600.0,
+                 months_ahead=2, keep_months=12):
+        super().__init__(daemon=True)
+        self.sql = sql
+        self.interval = interval
+        self.maintenance_interval = maintenance_interval
+        self.months_ahead = months_ahead
+        self.keep_months = keep_months
+        self._stop_event = threading.Event()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def run(self):
+        print("[RollupCompactor] Starting rollup maintenance...")
+        last_maintenance = None
+        schema_checked = False
+
+        while not self._stop_event.is_set():
+            start = time.perf_counter()
+            try:
+                # the connection drops during DB maintenance windows
+                if self.sql.connected() or self.sql.reconnect():
+                    if not schema_checked:
+                        print("[RollupCompactor] Checking database schema (index builds may take a while)...")
+                        # retried on the next pass if the DB went away meanwhile
+                        schema_checked = self.sql.createSchema()
+                        if schema_checked and self.sql.validateSchema():
+                            print("[RollupCompactor] Database schema incomplete (see above), queries will be slow")
+                    if last_maintenance is None or start - last_maintenance >= self.maintenance_interval:
+                        self.sql.maintain(self.months_ahead, self.keep_months)
+                        last_maintenance = start
+                    else:
+                        self.sql.updateRollups()
+                    if self.sql.Debug:
+                        print(f"[RollupCompactor] Rollups updated in {time.perf_counter() - start:.2f} s")
+            except Exception as e:
+                print("[RollupCompactor] ERROR during maintenance:", e)
+                self.sql.rollback()
+            self._stop_event.wait(self.interval)
+
+        print("[RollupCompactor] Stopped.")
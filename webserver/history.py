@@ -0,0 +1,137 @@
+import datetime
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from remote_readout import channel_names
+
+# ranges ending closer than this to now may still change and are not cached
+CACHE_SETTLE = 60.0  # s
+
+# pyramid series with a hole wider than one bucket plus this (the web host
+# was down while the hardware host kept writing) are answered from SQL
+GAP_TOLERANCE = 60.0  # s
+
+def parse_time(value, default=None):
+    """Unix seconds or an ISO date/time string -> unix seconds."""
+    if value is None or value == "":
+        return default
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.datetime.fromisoformat(value).timestamp()
+
+class HistoryQuery:
+    """
+    Range queries over the whole recorded history.
+
+    Each channel is answered from the TimeSeriesPyramid when it covers the
+    requested range without gaps, otherwise from one bulk SQL query (aggregated
+    server-side into about `points` buckets, from the 1 min / 1 h rollup
+    tables when buckets are at least that wide). Results are columnar
+    {"times", "min", "max", "mean", "last"} lists per channel. Ranges that
+    lie fully in the past are kept in an LRU cache of `cache_size` results;
+    a failed SQL query sets "error" in the result and is not cached.
+    """
+
+    def __init__(self, sql, pyramid=None, cache_size=64):
+        self.sql = sql
+        self.pyramid = pyramid
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.cache_lock = threading.Lock()
+
+        self.full_names = {name.replace(" [K]", ""): name for name in channel_names}
+        self.scids = {}
+
+    def channels(self):
+        return sorted(set(self.full_names) | set(self.pyramid.channels() if self.pyramid else []))
+
+    # ---------------- Query ----------------
+    def query(self, channels, start, end, points=1000):
+        key = (tuple(channels), start, end, points)
+        cacheable = end < time.time() - CACHE_SETTLE
+
+        if cacheable:
+            with self.cache_lock:
+                if key in self.cache:
+                    self.cache.move_to_end(key)
+                    return self.cache[key]
+
+        result = {"start": start, "end": end, "channels": {}}
+        from_sql = []
+        for ch in channels:
+            # the level query() would read; raw is trimmed on disk sooner
+            first = (self.pyramid.first_time(ch, self.pyramid.pick_level(start, end, points))
+                     if self.pyramid is not None else None)
+            if first is not None and first <= start:
+                series = self.from_pyramid(ch, start, end, points)
+                if self.complete(series, start, end):
+                    result["channels"][ch] = series
+                    continue
+            from_sql.append(ch)
+
+        if from_sql:
+            series, ok = self.from_sql(from_sql, start, end, points)
+            result["channels"].update(series)
+            if not ok:
+                # empty series from a failed query must not stick in the cache
+                result["error"] = "database query failed"
+                cacheable = False
+
+        if cacheable:
+            with self.cache_lock:
+                self.cache[key] = result
+                if len(self.cache) > self.cache_size:
+                    self.cache.popitem(last=False)
+        return result
+
+    def from_pyramid(self, channel, start, end, points):
+        data = self.pyramid.query(channel, start, end, points)
+        series = {k: data[k].tolist() for k in ("times", "min", "max", "mean", "last")}
+        series["bucket"] = data["level"]
+        series["source"] = "pyramid"
+        return series
+
+    @staticmethod
+    def complete(series, start, end):
+        """True if the pyramid series has no hole wider than GAP_TOLERANCE."""
+        times = series["times"]
+        if not times:
+            return False
+        limit = series["bucket"] + GAP_TOLERANCE
+        edges = np.diff([start] + times + [min(end, time.time())])
+        return bool(edges.max() <= limit)
+
+    def from_sql(self, channels, start, end, points):
+        # about `points` buckets; no aggregation below the 2 s sample period
+        bucket = (end - start) / points
+        if bucket < 2.0:
+            bucket = 0
+
+        # request threads borrow a pooled connection for the query; the
+        # checkout itself fails when the pool stays exhausted
+        try:
+            with self.sql.connection():
+                for ch in channels:
+                    if ch not in self.scids:
+                        self.scids[ch] = self.sql.getSCID(self.full_names.get(ch, ch))
+                scids = [self.scids[ch] for ch in channels if self.scids[ch] >= 0]
+                # wide buckets come from the rollup tables, not raw rows
+                if bucket >= 3600:
+                    rows = self.sql.getSCRollup(scids, start, end, "1h", bucket)
+                elif bucket >= 60:
+                    rows = self.sql.getSCRollup(scids, start, end, "1m", bucket)
+                else:
+                    rows = self.sql.getSCRange(scids, start, end, bucket)
+        except Exception as e:
+            print("[History] SQL query failed:", e)
+            rows = None
+
+        result = {}
+        for ch in channels:
+            series = (rows or {}).get(self.scids.get(ch, -1), {"times": [], "min": [], "max": [], "mean": [], "last": []})
+            result[ch] = dict(series, bucket=bucket, source="sql")
+        return result, rows is not None
@@ -0,0 +1,56 @@
+import threading
+import socket
+import json
+
+class ReadingPublisher:
+    """
+    Pushes every reading set from the hardware host to subscribed web servers.
+
+    Subscribers connect to the control socket and send "subscribe _ _ _";
+    DeviceControllerClient hands the open connection over with
+    add_subscriber(). Each reading set is then sent as one JSON line:
+        {"time": <unix seconds>, "readings": {device: {name: value}}}
+    Slow or closed subscribers are dropped; Postgres remains the archive.
+    """
+
+    def __init__(self, send_timeout=1.0):
+        self.send_timeout = send_timeout
+        self._lock = threading.Lock()
+        self._subscribers = []
+
+    def add_subscriber(self, conn: socket.socket):
+        conn.settimeout(self.send_timeout)
+        with self._lock:
+            self._subscribers.append(conn)
+        print(f"[Publisher] Subscriber added ({len(self._subscribers)} total)")
+
+    def publish(self, timestamp, readings):
+        line = json.dumps({
+            "time": timestamp.timestamp(),
+            "readings": readings,
+        }) + "\n"
+        data = line.encode("ascii")
+
+        with self._lock:
+            subscribers = list(self._subscribers)
+
+        dead = []
+        for conn in subscribers:
+            try:
+                conn.sendall(data)
+            except OSError:
+                dead.append(conn)
+
+        if dead:
+            with self._lock:
+                for conn in dead:
+                    if conn in self._subscribers:
+                        self._subscribers.remove(conn)
+                    conn.close()
+            print(f"[Publisher] Dropped {len(dead)} subscriber(s)")
+
+    def close(self):
+        with self._lock:
+            for conn in self._subscribers:
+                conn.close()
+            self._subscribers = []
@@ -1,29 +1,70 @@
 from controller_client import DeviceControllerClient
-from hardware_readout import HardwareTemperatureReader
+from hardware_readout import HardwareTemperatureReader, DatabaseWriter, RollupCompactor
+from state_readback import DeviceStateReader
+from live_publisher import ReadingPublisher
 from sql import SQL
+from spool import Spool, SpoolReplayer
 from device import connect_devices
 
 HOST = "0.0.0.0"
 PORT = 8084
 
+SQL_OPTIONS = ["localhost", "axion_writer", 8082, "axion_db"]
+
+# Use simulated instruments instead of scanning serial ports
+SIMULATE = False
+
 if __name__ == "__main__":
     # load devices and create controller
-    devices = connect_devices()
+    devices = connect_devices(simulate=SIMULATE)
     print("Detected devices:", list(devices.keys()))
-    controller = DeviceControllerClient(devices, HOST, PORT)
+    # sample actual heater/switch/still state in the background
+    state_reader = DeviceStateReader(devices)
+    # live readings are pushed to subscribed web servers over the control socket
+    publisher = ReadingPublisher()
+    controller = DeviceControllerClient(
+        devices, HOST, PORT,
+        state_reader=state_reader,
+        publisher=publisher
+    )
+
+    # create sql database instance; pooled, one connection per thread
+    # (main, writer, compactor, replayer). The schema and its indexes are
+    # created by the compactor in the background: on a large existing table
+    # the first index build takes long and must not delay sampling.
+    sql = SQL(debug=False, options=SQL_OPTIONS, pool_size=6)
+
+    # readings the database cannot take are kept on disk and replayed
+    spool = Spool()
 
-    # create sql database instance
-    sql = SQL(debug=False, options=["localhost", "axion_writer", 8082, "axion_db"])
+    # database writes are queued and batched off the sampling thread
+    db_writer = DatabaseWriter(sql, spool=spool, metrics=controller.metrics)
 
     # create hardware reader
-    temp_reader = HardwareTemperatureReader(devices, sql)
+    temp_reader = HardwareTemperatureReader(
+        devices, sql,
+        publisher=publisher,
+        metrics=controller.metrics,
+        writer=db_writer
+    )
 
     # start controller thread
     controller.start()
 
-    # start the temperature readout thread
+    # start the database writer and the temperature readout thread
+    db_writer.start()
     temp_reader.start()
 
+    # start the device state readback thread
+    state_reader.start()
+
+    # maintain the 1 min / 1 h rollup tables
+    compactor = RollupCompactor(sql)
+    compactor.start()
+
+    replayer = SpoolReplayer(spool, sql)
+    replayer.start()
+
     # keep main thread alive
     try:
         while True:
@@ -32,4 +73,10 @@ if __name__ == "__main__":
         print("\nStopping programme.")
         controller.stop()
         controller.join()
+        # flush queued readings before exiting
+        temp_reader.stop()
+        temp_reader.join()
+        db_writer.stop()
+        db_writer.join()
+        spool.close()
 
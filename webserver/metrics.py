@@ -0,0 +1,82 @@
+import threading
+import time
+from contextlib import contextmanager
+
+# Histogram bucket upper bounds in seconds (last bucket catches the rest)
+LATENCY_BUCKETS = [0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1.0, 2.0, 5.0]
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.bounds = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def observe(self, value):
+        i = 0
+        while i < len(self.bounds) and value > self.bounds[i]:
+            i += 1
+        self.counts[i] += 1
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def to_dict(self):
+        labels = [str(b) for b in self.bounds] + ["inf"]
+        return {
+            "count": self.count,
+            "sum": self.total,
+            "mean": self.total / self.count if self.count else None,
+            "min": self.min,
+            "max": self.max,
+            "buckets": dict(zip(labels, self.counts)),
+        }
+
+class Metrics:
+    """
+    Thread-safe per-command latency histograms and counters.
+
+    Latencies are keyed by (command, kind), e.g. ("set_switch_voltage",
+    "serial"); counters by (command, name), e.g. ("turn_off_heater",
+    "retries"). snapshot() returns a JSON-serialisable dict.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._counters = {}
+        self.started = time.time()
+
+    def observe(self, command, kind, seconds):
+        with self._lock:
+            key = (command, kind)
+            if key not in self._histograms:
+                self._histograms[key] = Histogram()
+            self._histograms[key].observe(seconds)
+
+    def count(self, command, name, n=1):
+        with self._lock:
+            key = (command, name)
+            self._counters[key] = self._counters.get(key, 0) + n
+
+    @contextmanager
+    def timer(self, command, kind):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(command, kind, time.perf_counter() - start)
+
+    def snapshot(self):
+        with self._lock:
+            result = {}
+            for (command, kind), hist in self._histograms.items():
+                entry = result.setdefault(command, {"latency": {}, "counters": {}})
+                entry["latency"][kind] = hist.to_dict()
+            for (command, name), n in self._counters.items():
+                entry = result.setdefault(command, {"latency": {}, "counters": {}})
+                entry["counters"][name] = n
+            return {"uptime": time.time() - self.started, "commands": result}
@@ -1,5 +1,5 @@
 from controller_server import DeviceControllerServer
-from remote_readout import plot_data, DBReader
+from remote_readout import plot_data, DBReader, LiveReader
 from device import get_channels_for_device
 from flask import Flask, render_template, request, jsonify, Response
 from sql import SQL
@@ -7,18 +7,39 @@ from sql import SQL
 import matplotlib
 matplotlib.use("Agg")
 
-import matplotlib.pyplot as plt
-import io
 import queue
+import time
 
-from algorithm import Cycle, AlgorithmConfig
+from algorithm import Cycle, AlgorithmConfig, config_from_dict, expected_states
+from cycle_checkpoint import CycleCheckpoint
+from conditions import ReadingWatch
+from plot_renderer import PlotRenderer
+from downsample import downsample_snapshot, METHODS as DOWNSAMPLE_METHODS
+from pyramid import TimeSeriesPyramid
+from history import HistoryQuery, parse_time
 
 algorithm_config = AlgorithmConfig()
 cycle_thread = None
 
+# Cycle position is checkpointed on every step; a checkpoint left over from
+# a previous process is offered for resume on /algorithm
+cycle_checkpoint = CycleCheckpoint()
+pending_resume = cycle_checkpoint.load()
+if pending_resume is not None:
+    print(f"[Algorithm] Interrupted cycle found at '{pending_resume['state']}', "
+          f"resume from /algorithm")
+
 HOST = "127.0.0.1"
 PORT = 8084
 
+# Live plots come straight from the hardware host's reading stream.
+# Set to False to poll Postgres (DBReader) instead.
+LIVE_STREAM = True
+# hours of history shown in the plots right after a restart
+PRELOAD_HOURS = 6
+# upper bound on buckets per channel a /api/history request may ask for
+MAX_HISTORY_POINTS = 5000
+
 # Global dictionary storing last set values for all devices/channels
 # Keys are tuples: (device_name, channel_name)
 LAST_VALUES = {}
@@ -73,17 +94,83 @@ def algorithm_status():
         "state": "Idle",
         "side": None,
         "elapsed": 0,
-        "total": 1
+        "total": 1,
+        "resumable": pending_resume is not None
     })
 
 @app.route("/api/algorithm/start", methods=["POST"])
 def start_algorithm():
-    global cycle_thread
+    global cycle_thread, pending_resume
     if cycle_thread is None or not cycle_thread.is_alive():
-        cycle_thread = Cycle(controller, algorithm_config, LAST_VALUES, LAST_STATES)
+        # a fresh start replaces any interrupted cycle
+        pending_resume = None
+        cycle_thread = Cycle(
+            controller, algorithm_config, LAST_VALUES, LAST_STATES,
+            readings=live_readings,
+            checkpoint=cycle_checkpoint
+        )
         cycle_thread.start()
     return jsonify({"status":"started"})
 
+# RESUME
+@app.route("/api/algorithm/resume", methods=["GET"])
+def resume_info():
+    if pending_resume is None:
+        return jsonify({"available": False})
+
+    config = config_from_dict(pending_resume["config"])
+    side = pending_resume["side"]
+    expected = expected_states(side, getattr(config, side[-1]), pending_resume["step"])
+
+    # compare what the step expects with the hardware readback
+    try:
+        readback = controller.get_state().get("devices", {}).get(side, {})
+    except Exception as e:
+        print("[Web] get_state failed:", e)
+        readback = {}
+
+    mismatches = []
+    for ch, (state, value) in expected.items():
+        mapped = readback_value_and_state(readback.get(ch, {"error": "no readback"}))
+        if mapped is None:
+            mismatches.append({"channel": ch, "expected": state, "actual": "unknown"})
+        elif mapped[1] != state:
+            mismatches.append({"channel": ch, "expected": state, "actual": mapped[1]})
+
+    return jsonify({
+        "available": True,
+        "state": pending_resume["state"],
+        "side": side,
+        "step": pending_resume["step"],
+        "elapsed": time.time() - pending_resume["step_start"],
+        "mismatches": mismatches
+    })
+
+@app.route("/api/algorithm/resume", methods=["POST"])
+def resume_algorithm():
+    global cycle_thread, pending_resume, algorithm_config
+    if pending_resume is None:
+        return jsonify({"status": "nothing to resume"}), 404
+
+    if cycle_thread is None or not cycle_thread.is_alive():
+        algorithm_config = config_from_dict(pending_resume["config"])
+        cycle_thread = Cycle(
+            controller, algorithm_config, LAST_VALUES, LAST_STATES,
+            readings=live_readings,
+            checkpoint=cycle_checkpoint,
+            resume=pending_resume
+        )
+        pending_resume = None
+        cycle_thread.start()
+    return jsonify({"status": "resumed"})
+
+@app.route("/api/algorithm/resume/discard", methods=["POST"])
+def discard_resume():
+    global pending_resume
+    pending_resume = None
+    cycle_checkpoint.clear()
+    return jsonify({"status": "discarded"})
+
 @app.route("/api/algorithm/stop", methods=["POST"])
 def stop_algorithm():
     if cycle_thread and cycle_thread.is_alive():
@@ -160,12 +247,69 @@ def controller_page():
         last_states=LAST_STATES
     )
 
+def readback_value_and_state(reading):
+    """Map one channel of get_state() readback to (value, "on"/"off")."""
+    kind = reading.get("kind")
+    if "error" in reading:
+        return None
+    if kind == "heater":
+        on = reading.get("pid_mode") == "On"
+        return (reading.get("setpoint") if on else None), ("on" if on else "off")
+    if kind == "switch":
+        voltage = reading.get("voltage")
+        on = voltage is not None and voltage > 0
+        return (voltage if on else None), ("on" if on else "off")
+    if kind == "still_heater":
+        output = reading.get("output")
+        on = output is not None and output > 0
+        return (output if on else None), ("on" if on else "off")
+    return None
+
 @app.route("/api/controller_state")
 def api_controller_state():
     # Convert tuple keys to strings so JSON can send them
     values = {f"{dev}::{ch}": val for (dev, ch), val in LAST_VALUES.items()}
     states = {f"{dev}::{ch}": st for (dev, ch), st in LAST_STATES.items()}
-    return jsonify({"values": values, "states": states})
+
+    # Prefer the readback cached on the hardware host (no serial traffic)
+    try:
+        readback = controller.get_state()
+    except Exception as e:
+        print("[Web] get_state failed:", e)
+        readback = {"time": None, "devices": {}}
+
+    for dev, channels in readback.get("devices", {}).items():
+        for ch, reading in channels.items():
+            mapped = readback_value_and_state(reading)
+            if mapped is None:
+                continue
+            values[f"{dev}::{ch}"], states[f"{dev}::{ch}"] = mapped
+
+    return jsonify({
+        "values": values,
+        "states": states,
+        "readback": readback
+    })
+
+@app.route("/api/metrics")
+def api_metrics():
+    # Web-side round trip/retry/failure counts plus the hardware host's
+    # lock wait, serial time and failure counts
+    try:
+        hardware = controller.get_metrics()
+    except Exception as e:
+        hardware = {"error": str(e)}
+
+    return jsonify({
+        "web": controller.metrics.snapshot(),
+        "hardware": hardware
+    })
+
+@app.route("/api/trends")
+def api_trends():
+    # Per-channel value, gradient (K/min), noise (K) and stable flag
+    with live_readings.changed:
+        return jsonify(live_readings.trends.summary())
 
 
 # SWITCH CONTROL
@@ -179,8 +323,8 @@ def api_set_switch():
     LAST_VALUES[(dev, ch)] = value      # STORE VALUE
     LAST_STATES[(dev, ch)] = "on"
 
-    controller.set_switch_voltage(dev, ch, value)
-    return jsonify(status="ok")
+    written = controller.set_switch_voltage(dev, ch, value, force=bool(data.get("force", False)))
+    return jsonify(status="ok", written=written)
 
 @app.route("/api/turn_off_switch", methods=["POST"])
 def api_switch_off():
@@ -191,8 +335,8 @@ def api_switch_off():
     LAST_VALUES[(dev, ch)] = None       # CLEAR VALUE
     LAST_STATES[(dev, ch)] = "off"
 
-    controller.turn_off_switch(dev, ch)
-    return jsonify(status="ok")
+    written = controller.turn_off_switch(dev, ch, force=bool(data.get("force", False)))
+    return jsonify(status="ok", written=written)
 
 
 # HEATER CONTROL
@@ -206,8 +350,8 @@ def api_set_heater_temp():
     LAST_VALUES[(dev, ch)] = value      # STORE VALUE
     LAST_STATES[(dev, ch)] = "on"
 
-    controller.set_heater_temperature(dev, ch, value)
-    return jsonify(status="ok")
+    written = controller.set_heater_temperature(dev, ch, value, force=bool(data.get("force", False)))
+    return jsonify(status="ok", written=written)
 
 @app.route("/api/turn_off_heater", methods=["POST"])
 def api_heater_off():
@@ -218,8 +362,8 @@ def api_heater_off():
     LAST_VALUES[(dev, ch)] = None       # CLEAR VALUE
     LAST_STATES[(dev, ch)] = "off"
 
-    controller.turn_off_heater(dev, ch)
-    return jsonify(status="ok")
+    written = controller.turn_off_heater(dev, ch, force=bool(data.get("force", False)))
+    return jsonify(status="ok", written=written)
 
 
 # STILL HEATER CONTROL
@@ -233,8 +377,8 @@ def api_set_still():
     LAST_VALUES[(dev, ch)] = value      # STORE VALUE
     LAST_STATES[(dev, ch)] = "on"
 
-    controller.set_still_percentage(dev, ch, value)
-    return jsonify(status="ok")
+    written = controller.set_still_percentage(dev, ch, value, force=bool(data.get("force", False)))
+    return jsonify(status="ok", written=written)
 
 @app.route("/api/turn_off_still", methods=["POST"])
 def api_still_off():
@@ -245,8 +389,8 @@ def api_still_off():
     LAST_VALUES[(dev, ch)] = None       # CLEAR VALUE
     LAST_STATES[(dev, ch)] = "off"
 
-    controller.turn_off_still(dev, ch)
-    return jsonify(status="ok")
+    written = controller.turn_off_still(dev, ch, force=bool(data.get("force", False)))
+    return jsonify(status="ok", written=written)
 
 # plotting
 PLOT_MAPPING = {}
@@ -262,12 +406,35 @@ for dev_name in devices.keys():
 print("Dynamic PLOT_MAPPING:", PLOT_MAPPING)
 
 # create sql database instance
-sql = SQL(debug=False, options=["localhost", "axion_writer", 8082, "axion_db"])
+SQL_OPTIONS = ["localhost", "axion_writer", 8082, "axion_db"]
+# pooled: the reader thread and request threads each use their own
+# connection; read-only, so autocommit keeps no transaction open between polls
+sql = SQL(debug=False, options=SQL_OPTIONS, pool_size=8, autocommit=True)
+if sql.validateSchema():
+    print("Database schema incomplete (see above), history queries will be slow")
 
 plot_queue = queue.Queue()
-db_reader = DBReader(sql, plot_queue)
+
+# latest reading per channel, drives condition-based algorithm steps
+live_readings = ReadingWatch()
+
+# multi-resolution history (raw, 10 s, 1 min, 10 min, 1 h), kept on disk
+history = TimeSeriesPyramid()
+
+# range queries over everything recorded
+history_query = HistoryQuery(sql, history)
+
+if LIVE_STREAM:
+    db_reader = LiveReader(HOST, PORT, plot_queue, readings=live_readings, pyramid=history,
+                           sql=sql, preload_hours=PRELOAD_HOURS)
+else:
+    db_reader = DBReader(sql, plot_queue, readings=live_readings, pyramid=history,
+                         preload_hours=PRELOAD_HOURS)
 db_reader.start()   # start reader thread
 
+# the startup queries above ran on the main thread; give its connection back
+sql.release()
+
 def update_latest_plot_data():
     global latest_plot_snapshot
     try:
@@ -278,133 +445,71 @@ def update_latest_plot_data():
     except queue.Empty:
         pass
 
+def current_plot_snapshot():
+    update_latest_plot_data()
+    return globals().get("latest_plot_snapshot")
+
+# Plots are rendered in the background with persistent figures; requests
+# only copy the latest PNG
+plot_renderer = PlotRenderer(PLOT_MAPPING, current_plot_snapshot, trend=live_readings.trend)
+plot_renderer.start()
+
 @app.route("/plot/<int:plot_id>.png")
 def plot_png(plot_id):
     if plot_id not in PLOT_MAPPING:
         return "Invalid plot ID", 404
 
-    device, channels = PLOT_MAPPING[plot_id]
-
-    # Pull newest snapshot from queue
-    update_latest_plot_data()
-    if "latest_plot_snapshot" not in globals():
-        return "No data yet", 503
-
-    device_data = latest_plot_snapshot.get(device, {})
-    times = device_data.get("times", [])
-
-    if not times:
+    png = plot_renderer.get_png(plot_id)
+    if png is None:
         return "No data yet", 503
 
-    # Convert times to minutes since first timestamp
-    t0 = times[0]
-    times_min = [(t - t0).total_seconds() / 60.0 for t in times]
-
-    # Sliding 10-minute window
-    WINDOW_MIN = 10.0
-    if times_min[-1] > WINDOW_MIN:
-        t_max = times_min[-1]
-        mask = [t >= t_max - WINDOW_MIN for t in times_min]
-    else:
-        mask = [True] * len(times_min)
-
-    times_plot = [t for t, m in zip(times_min, mask) if m]
-
-    fig, ax = plt.subplots(figsize=(6, 3))
-    ax.set_xlabel("Time (min)")
-    ax.set_ylabel("Temperature (K)")
-    ax.set_title(device)
-    ax.grid(True)
-
-    legend_entries = []
-
-    for ch in channels:
-        ys = device_data.get(ch, [])
-        if not ys:
-            continue
-
-        # Apply mask + filter invalid values
-        ys_plot = []
-        ts_plot = []
-
-        for t, y, m in zip(times_min, ys, mask):
-            if not m:
-                continue
-            if y <= -9:
-                continue
-
-            # Channel-specific cutoffs
-            if ch == "50K" and y < 50:
-                continue
-            if ch == "4K" and y < 10:
-                continue
-
-            ts_plot.append(t)
-            ys_plot.append(y)
-
-        if len(ts_plot) < 2:
-            continue
-
-        line, = ax.plot(ts_plot, ys_plot, label=ch)
-        legend_entries.append((ch, ys_plot, ts_plot))
-
-    if not legend_entries:
-        return "No valid data to plot", 503
-
-    leg = ax.legend(
-        loc="upper left",
-        bbox_to_anchor=(1.02, 1),
-        frameon=True,
-        fontsize="small"
-    )
-
-    # Update legend text with current value + gradient
-    for text, (ch, ys, ts) in zip(leg.texts, legend_entries):
-        current = ys[-1]
-
-        # Gradient over last 30 seconds
-        grad_text = ""
-        t_now = ts[-1]
-        for i in range(len(ts) - 1, -1, -1):
-            if (t_now - ts[i]) * 60 >= 30:
-                dt_min = t_now - ts[i]
-                grad = (ys[-1] - ys[i]) / dt_min * 1000.0  # mK/min
-                grad_text = f"\n{grad:+.1f}mK/min"
-                break
-
-        text.set_text(f"{ch} {current:.3f}K{grad_text}")
-
-    fig.tight_layout()
-    buf = io.BytesIO()
-    fig.savefig(buf, format="png")
-    plt.close(fig)
-
-    buf.seek(0)
-    return Response(buf.getvalue(), mimetype="image/png")
+    return Response(png, mimetype="image/png")
 
 @app.route("/api/plotdata")
 def api_plotdata():
 
-    # Get latest DB data
-    latest_plot_data = None
-    try:
-        while True:
-            latest_plot_data = plot_queue.get_nowait()
-    except queue.Empty:
-        pass
-
+    # Latest DB data; the queue itself is only drained by update_latest_plot_data
+    latest_plot_data = current_plot_snapshot()
     if latest_plot_data is None:
         latest_plot_data = plot_data
 
+    # optional ?points=N&window=<min>&method=minmax|lttb downsampling; the
+    # picked samples are not evenly spaced, so each channel then comes as
+    # {"times": [unix s], "values": [K]}
+    data, reduced = requested_snapshot(latest_plot_data)
+    missing = {"times": [], "values": []} if reduced else []
+
     result = {}
     for pid, (dev_name, channels) in PLOT_MAPPING.items():
         result[pid] = {
-            ch: latest_plot_data.get(dev_name, {}).get(ch, [])
+            ch: data.get(dev_name, {}).get(ch, missing)
             for ch in channels
         }
 
     return jsonify(result)
 
+@app.route("/api/history")
+def api_history():
+    # ?channels=MC,Still&start=...&end=...&points=N
+    # start/end are unix seconds or ISO date/times; default is the last day
+    known = history_query.channels()
+    channels = [c for c in request.args.get("channels", "").split(",") if c]
+    if not channels:
+        channels = known
+    unknown = [c for c in channels if c not in known]
+    if unknown:
+        return jsonify({"error": "unknown channels: " + ", ".join(unknown)}), 400
+    try:
+        end = parse_time(request.args.get("end"), time.time())
+        start = parse_time(request.args.get("start"), end - 86400)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if end <= start:
+        return jsonify({"error": "end must be after start"}), 400
+
+    points = min(max(request.args.get("points", 1000, type=int), 10), MAX_HISTORY_POINTS)
+    return jsonify(history_query.query(channels, start, end, points))
+
 @app.route("/display/<device_name>")
 def display_device(device_name):
     plot_ids = [
@@ -423,13 +528,34 @@ def display_all():
     return render_template("display.html",
                            plots=list(PLOT_MAPPING.keys()))
 
+def downsample_args():
+    """(points, window in s, method) from the query string; points None = raw data."""
+    points = request.args.get("points", type=int)
+    window = request.args.get("window", type=float)
+    method = request.args.get("method", "minmax")
+    if method not in DOWNSAMPLE_METHODS:
+        method = "minmax"
+    if points is not None:
+        points = max(points, 10)
+    return points, window * 60 if window else None, method
+
+def requested_snapshot(snapshot):
+    """The shared snapshot, downsampled if the request asks for it; (data, reduced)."""
+    points, window, method = downsample_args()
+    if points is None:
+        return snapshot, False
+    return downsample_snapshot(snapshot, points, window, method), True
+
 @app.route("/api/plotly_data")
 def api_plotly_data():
     update_latest_plot_data()
     if "latest_plot_snapshot" not in globals():
         return jsonify({})
 
-    return jsonify(latest_plot_snapshot)
+    # with ?points=N (and optionally window=<min>, method=minmax|lttb) every
+    # channel comes back as its own downsampled {"times": [s], "values": [K]}
+    data, _ = requested_snapshot(latest_plot_snapshot)
+    return jsonify(data)
 
 @app.route("/interactive")
 def interactive():
@@ -0,0 +1,165 @@
+"""
+Parallel parameter sweep of AlgorithmConfig over simulated cycles.
+
+Every point of a parameter grid is run through cycle_simulation.simulate_cycle
+in a process pool and scored from its MC trace. Results are collected into a
+columnar table (dict of equal-length lists, one column per parameter and
+metric) and the Pareto-best configurations are reported.
+
+Parameter names are SideConfig fields. A bare name ("t_heaters_on") is applied
+to both sides, a prefixed one ("A.t_heaters_on") to one side only.
+"""
+import contextlib
+import dataclasses
+import io
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from algorithm import AlgorithmConfig
+from cycle_simulation import simulate_cycle
+
+# MC below this counts as "cold" for hold time and duty cycle
+MC_THRESHOLD = 0.1  # K
+
+# metric -> True if larger is better
+OBJECTIVES = {
+    "mc_hold_time": True,
+    "mc_duty_cycle": True,
+    "mc_min": False,
+}
+
+# ---------------- Configs ----------------
+def make_config(params: dict) -> AlgorithmConfig:
+    config = AlgorithmConfig()
+    for name, value in params.items():
+        sides = ("A", "B")
+        if "." in name:
+            side, name = name.split(".", 1)
+            sides = (side,)
+        for side in sides:
+            side_cfg = getattr(config, side)
+            if not hasattr(side_cfg, name):
+                raise ValueError(f"Unknown SideConfig field: {name}")
+            setattr(config, side, dataclasses.replace(side_cfg, **{name: value}))
+    return config
+
+def expand_grid(grid: dict) -> list:
+    """{"name": [v1, v2], ...} -> list of {"name": v, ...} for every combination."""
+    names = list(grid)
+    return [dict(zip(names, values)) for values in itertools.product(*grid.values())]
+
+# ---------------- Scoring ----------------
+def score_trace(trace, threshold=MC_THRESHOLD, warmup=0.0):
+    """MC metrics of one simulated trace, ignoring samples before `warmup` s."""
+    times = trace["time"]
+    mc = trace["MC"]
+
+    samples = [(t, y) for t, y in zip(times, mc) if t >= warmup]
+    if len(samples) < 2:
+        return {"mc_min": None, "mc_mean": None, "mc_hold_time": 0.0, "mc_duty_cycle": 0.0}
+
+    cold_time = 0.0
+    hold = 0.0
+    longest_hold = 0.0
+    for (t0, y0), (t1, _) in zip(samples[:-1], samples[1:]):
+        dt = t1 - t0
+        if y0 < threshold:
+            cold_time += dt
+            hold += dt
+            longest_hold = max(longest_hold, hold)
+        else:
+            hold = 0.0
+
+    values = [y for _, y in samples]
+    return {
+        "mc_min": min(values),
+        "mc_mean": sum(values) / len(values),
+        "mc_hold_time": longest_hold,
+        "mc_duty_cycle": cold_time / (samples[-1][0] - samples[0][0]),
+    }
+
+def run_one(params, duration, sample_interval, warmup):
+    """Worker: simulate one configuration and return params + metrics."""
+    # Cycle prints every start/stop; keep worker output quiet
+    with contextlib.redirect_stdout(io.StringIO()):
+        trace = simulate_cycle(make_config(params), duration, sample_interval)
+    row = dict(params)
+    row.update(score_trace(trace, warmup=warmup))
+    return row
+
+# ---------------- Sweep ----------------
+def run_sweep(grid: dict, duration=24 * 3600, sample_interval=30.0, warmup=3 * 3600,
+              workers=None):
+    """
+    Simulate every combination in `grid` across a process pool.
+    Returns the columnar results table.
+    """
+    points = expand_grid(grid)
+    workers = workers or os.cpu_count()
+    print(f"[Sweep] {len(points)} configurations on {workers} workers")
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        rows = list(pool.map(
+            run_one,
+            points,
+            itertools.repeat(duration),
+            itertools.repeat(sample_interval),
+            itertools.repeat(warmup),
+            chunksize=max(1, len(points) // (workers * 4)),
+        ))
+
+    return to_columns(rows)
+
+def to_columns(rows: list) -> dict:
+    columns = {}
+    for row in rows:
+        for key in row:
+            columns.setdefault(key, [])
+    for row in rows:
+        for key in columns:
+            columns[key].append(row.get(key))
+    return columns
+
+def pareto_front(table: dict, objectives=OBJECTIVES) -> list:
+    """Row indices not dominated on any objective (None counts as worst)."""
+    n = len(next(iter(table.values()), []))
+
+    def key(i, name):
+        value = table[name][i]
+        if value is None:
+            return float("-inf")
+        return value if objectives[name] else -value
+
+    scores = [[key(i, name) for name in objectives] for i in range(n)]
+    front = []
+    for i in range(n):
+        dominated = any(
+            all(a >= b for a, b in zip(scores[j], scores[i])) and scores[j] != scores[i]
+            for j in range(n) if j != i
+        )
+        if not dominated:
+            front.append(i)
+    return front
+
+def print_front(table: dict, front: list):
+    names = list(table)
+    print(" | ".join(names))
+    for i in front:
+        cells = []
+        for name in names:
+            value = table[name][i]
+            cells.append(f"{value:.4g}" if isinstance(value, float) else str(value))
+        print(" | ".join(cells))
+
+if __name__ == "__main__":
+    grid = {
+        "t_heaters_on": [900, 1200, 1800],
+        "t_switch_on": [600, 900, 1200],
+        "t_between_sides": [1800, 2700, 3600],
+        "heater_4puheat": [40.0, 50.0],
+    }
+    table = run_sweep(grid)
+    front = pareto_front(table)
+    print(f"[Sweep] {len(front)} Pareto-best configurations:")
+    print_front(table, front)
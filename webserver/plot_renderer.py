@@ -0,0 +1,214 @@
+import io
+import math
+import threading
+import time
+
+import numpy as np
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+import matplotlib.image as mpimg
+
+# Channel-specific cutoffs (K): readings below are sensor artefacts
+CUTOFFS = {"50K": 50, "4K": 10}
+
+# ---------------- Single live plot ----------------
+class LivePlot:
+    """
+    One persistent figure with a Line2D per channel.
+
+    Lines and legend are animated artists: a full canvas draw renders only
+    the static parts (axes, ticks, grid, labels) and is cached as the
+    background. Each frame restores that background and draws the animated
+    artists on top. The background is redrawn only when the axis limits have
+    to move, which happens in steps of `x_step` of the window on x and when
+    the data leaves (or shrinks well inside) the current y range.
+    """
+
+    def __init__(self, title, channels, window_min=10.0, x_step=0.1):
+        self.channels = list(channels)
+        self.window_min = window_min
+        self.x_step = window_min * x_step
+
+        self.fig = Figure(figsize=(6, 3))
+        self.canvas = FigureCanvasAgg(self.fig)
+        self.ax = self.fig.add_subplot()
+        self.ax.set_xlabel("Time (min)")
+        self.ax.set_ylabel("Temperature (K)")
+        self.ax.set_title(title)
+        self.ax.grid(True)
+
+        self.lines = {}
+        for ch in self.channels:
+            line, = self.ax.plot([], [], label=ch, animated=True)
+            self.lines[ch] = line
+
+        self.legend = self.ax.legend(
+            loc="upper left",
+            bbox_to_anchor=(1.02, 1),
+            frameon=True,
+            fontsize="small"
+        )
+        self.legend.set_animated(True)
+        self.texts = dict(zip(self.channels, self.legend.texts))
+
+        # lay out once with room for the longest legend text
+        for ch, text in self.texts.items():
+            text.set_text(f"{ch} 000.000K\n+0000.0mK/min")
+        self.fig.tight_layout()
+
+        self.background = None
+        self.xlim = None
+        self.ylim = None
+
+    def _limits_changed(self, t_max, y_min, y_max):
+        changed = False
+
+        right = math.ceil(t_max / self.x_step) * self.x_step
+        xlim = (right - self.window_min, right) if t_max > self.window_min else (0, self.window_min)
+        if xlim != self.xlim:
+            self.xlim = xlim
+            changed = True
+
+        if y_min is not None:
+            span = max(y_max - y_min, 1e-3)
+            lo, hi = self.ylim or (None, None)
+            if (self.ylim is None or y_min < lo or y_max > hi
+                    or span < 0.25 * (hi - lo)):
+                self.ylim = (y_min - 0.1 * span, y_max + 0.1 * span)
+                changed = True
+
+        return changed
+
+    def render(self, times_min, series, legend_texts) -> bytes:
+        """
+        times_min: sample times (min) shared by all channels;
+        series: {ch: values}, aligned to the end of times_min;
+        legend_texts: {ch: text}. Returns PNG bytes.
+        """
+        y_min = y_max = None
+        t_max = times_min[-1] if times_min else 0.0
+        t_lo = t_max - self.window_min
+
+        for ch, line in self.lines.items():
+            ys = series.get(ch, [])
+            ts = times_min[len(times_min) - len(ys):] if ys else []
+
+            xs_plot, ys_plot = [], []
+            cutoff = CUTOFFS.get(ch)
+            for t, y in zip(ts, ys):
+                if t < t_lo or y <= -9:
+                    continue
+                if cutoff is not None and y < cutoff:
+                    continue
+                xs_plot.append(t)
+                ys_plot.append(y)
+
+            line.set_data(xs_plot, ys_plot)
+            if ys_plot:
+                lo, hi = min(ys_plot), max(ys_plot)
+                y_min = lo if y_min is None else min(y_min, lo)
+                y_max = hi if y_max is None else max(y_max, hi)
+
+            self.texts[ch].set_text(legend_texts.get(ch, ch))
+
+        limits_changed = self._limits_changed(t_max, y_min, y_max)
+        if limits_changed or self.background is None:
+            self.ax.set_xlim(*self.xlim)
+            if self.ylim is not None:
+                self.ax.set_ylim(*self.ylim)
+            # static parts only; animated artists are skipped
+            self.canvas.draw()
+            self.background = self.canvas.copy_from_bbox(self.fig.bbox)
+        else:
+            self.canvas.restore_region(self.background)
+
+        for line in self.lines.values():
+            self.ax.draw_artist(line)
+        self.fig.draw_artist(self.legend)
+
+        buf = io.BytesIO()
+        mpimg.imsave(buf, np.asarray(self.canvas.buffer_rgba()), format="png")
+        return buf.getvalue()
+
+# ---------------- Renderer thread ----------------
+class PlotRenderer(threading.Thread):
+    """
+    Renders every plot of `plot_mapping` ({plot_id: (device, channels)}) in
+    the background and keeps the latest PNG per plot, so request handlers only
+    copy bytes.
+
+    snapshot() returns plot data as {device: {"times": [...], ch: [...]}},
+    with times as datetimes or seconds. trend(ch) returns a
+    TrendEstimator.snapshot() dict (or None) for the legend gradients.
+    """
+
+    def __init__(self, plot_mapping, snapshot, trend=None, interval=2.0, window_min=10.0):
+        super().__init__(daemon=True)
+        self.plot_mapping = plot_mapping
+        self.snapshot = snapshot
+        self.trend = trend
+        self.interval = interval
+
+        self.plots = {
+            plot_id: LivePlot(device, channels, window_min)
+            for plot_id, (device, channels) in plot_mapping.items()
+        }
+        self.lock = threading.Lock()
+        self.images = {}
+        self.last_seen = {}
+        self.stop_event = threading.Event()
+
+    def get_png(self, plot_id):
+        with self.lock:
+            return self.images.get(plot_id)
+
+    def stop(self):
+        self.stop_event.set()
+
+    def legend_text(self, ch, ys):
+        if not ys:
+            return ch
+        text = f"{ch} {ys[-1]:.3f}K"
+        trend = self.trend(ch) if self.trend is not None else None
+        if trend is not None and trend["gradient"] is not None:
+            text += f"\n{trend['gradient'] * 1000.0:+.1f}mK/min"
+        return text
+
+    def render_plot(self, plot_id, device_data):
+        times = device_data.get("times", [])
+        if not times:
+            return None
+
+        # skip plots whose data has not changed since the last render
+        key = (len(times), times[-1])
+        if self.last_seen.get(plot_id) == key:
+            return None
+        self.last_seen[plot_id] = key
+
+        t0 = times[0]
+        if isinstance(t0, (int, float)):
+            times_min = [(t - t0) / 60.0 for t in times]
+        else:
+            times_min = [(t - t0).total_seconds() / 60.0 for t in times]
+
+        _, channels = self.plot_mapping[plot_id]
+        series = {ch: device_data.get(ch, []) for ch in channels}
+        texts = {ch: self.legend_text(ch, series[ch]) for ch in channels}
+        return self.plots[plot_id].render(times_min, series, texts)
+
+    def run(self):
+        print("[PlotRenderer] Started.")
+        while not self.stop_event.is_set():
+            start = time.time()
+            data = self.snapshot()
+            if data:
+                for plot_id, (device, _) in self.plot_mapping.items():
+                    try:
+                        png = self.render_plot(plot_id, data.get(device, {}))
+                    except Exception as e:
+                        print(f"[PlotRenderer] plot {plot_id} failed:", e)
+                        continue
+                    if png is not None:
+                        with self.lock:
+                            self.images[plot_id] = png
+            self.stop_event.wait(max(0.0, self.interval - (time.time() - start)))
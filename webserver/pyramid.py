@@ -0,0 +1,270 @@
+import bisect
+import math
+import os
+import threading
+import time
+
+import numpy as np
+
+DEFAULT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "pyramid")
+
+# bucket size (s) -> seconds kept in memory; 0 is the raw level
+LEVELS = {
+    0: 6 * 3600,
+    10: 2 * 86400,
+    60: 14 * 86400,
+    600: 90 * 86400,
+    3600: 365 * 86400,
+}
+
+# bucket size (s) -> seconds kept on disk; levels not listed grow without
+# limit (bucket levels are small, raw is ~16 bytes per sample)
+DISK_RETENTION = {
+    0: 30 * 86400,
+}
+
+RAW_DTYPE = np.dtype([("t", "<f8"), ("value", "<f8")])
+BUCKET_DTYPE = np.dtype([
+    ("t", "<f8"), ("min", "<f8"), ("max", "<f8"),
+    ("mean", "<f8"), ("last", "<f8"), ("count", "<i8"),
+])
+
+# ---------------- One channel, one level ----------------
+class Series:
+    """
+    Finished buckets of one level: a recent tail in memory (`retention`
+    seconds) and an append-only file of fixed-size records. With
+    `disk_retention` the file is rewritten to its last disk_retention
+    seconds once it holds about 10 % more than that.
+    The raw level stores (t, value); bucket levels store
+    (t, min, max, mean, last, count) with t the bucket start.
+    """
+
+    def __init__(self, path, dtype, retention, disk_retention=None):
+        self.path = path
+        self.dtype = dtype
+        self.retention = retention
+        self.disk_retention = disk_retention
+        self.times = []
+        self.rows = []
+        self.unwritten = []
+        self.first_t = None
+
+        data = self._map()
+        if len(data):
+            # only the tail is read into memory
+            i = int(np.searchsorted(data["t"], data["t"][-1] - retention))
+            keep = np.array(data[i:])
+            self.first_t = float(data["t"][0])
+            self.times = keep["t"].tolist()
+            self.rows = [tuple(r) for r in keep.tolist()]
+
+    def _map(self):
+        """Memory map of the file, dropping a partially written last record."""
+        if not os.path.exists(self.path):
+            return np.array([], dtype=self.dtype)
+        size = os.path.getsize(self.path)
+        count = size // self.dtype.itemsize
+        if size != count * self.dtype.itemsize:
+            os.truncate(self.path, count * self.dtype.itemsize)
+        if count == 0:
+            return np.array([], dtype=self.dtype)
+        return np.memmap(self.path, dtype=self.dtype, mode="r", shape=(count,))
+
+    def append(self, row):
+        self.times.append(row[0])
+        self.rows.append(row)
+        self.unwritten.append(row)
+
+        # trim the memory tail in blocks rather than per sample
+        cutoff = row[0] - self.retention
+        if self.times[0] < cutoff - 0.1 * self.retention:
+            i = bisect.bisect_left(self.times, cutoff)
+            del self.times[:i]
+            del self.rows[:i]
+
+    def flush(self):
+        if not self.unwritten:
+            return
+        with open(self.path, "ab") as f:
+            f.write(np.array(self.unwritten, dtype=self.dtype).tobytes())
+        if self.first_t is None:
+            self.first_t = self.unwritten[0][0]
+        last = self.unwritten[-1][0]
+        self.unwritten = []
+
+        if self.disk_retention and last - self.first_t > 1.1 * self.disk_retention:
+            self._trim(last - self.disk_retention)
+
+    def _trim(self, cutoff):
+        data = self._map()
+        i = int(np.searchsorted(data["t"], cutoff))
+        keep = np.array(data[i:])
+        del data
+        tmp = self.path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(keep.tobytes())
+        os.replace(tmp, self.path)
+        self.first_t = float(keep["t"][0]) if len(keep) else None
+
+    def range(self, start, end):
+        """Structured array of rows with start <= t < end."""
+        if self.times and start >= self.times[0]:
+            i = bisect.bisect_left(self.times, start)
+            j = bisect.bisect_left(self.times, end)
+            return np.array(self.rows[i:j], dtype=self.dtype)
+
+        # older than the memory tail: read from disk
+        self.flush()
+        data = self._map()
+        if len(data) == 0:
+            return data
+        i, j = np.searchsorted(data["t"], [start, end])
+        return np.array(data[i:j])
+
+# ---------------- Pyramid ----------------
+class TimeSeriesPyramid:
+    """
+    Per-channel aggregates at several resolutions (raw, 10 s, 1 min, 10 min,
+    1 h), each bucket holding min, max, mean and last.
+
+    add() is called once per reading set (DBReader / LiveReader) and updates
+    every level incrementally: the open bucket of each level is folded in
+    place and written out when a sample falls into the next bucket. Finished
+    buckets are appended to disk every `flush_interval` seconds.
+
+    query() returns the coarsest level that still has at least `points`
+    buckets in the requested range, so long ranges read few rows.
+    """
+
+    def __init__(self, directory=DEFAULT_DIR, levels=LEVELS, flush_interval=10.0,
+                 disk_retention=DISK_RETENTION):
+        self.directory = directory
+        self.levels = dict(sorted(levels.items()))
+        self.disk_retention = disk_retention
+        self.flush_interval = flush_interval
+        self.lock = threading.Lock()
+
+        os.makedirs(directory, exist_ok=True)
+        self.series = {}   # (channel, size) -> Series
+        self.open = {}     # (channel, size) -> [start, min, max, sum, last, count]
+        self.last_flush = time.monotonic()
+
+    def _path(self, channel, size):
+        level = "raw" if size == 0 else f"{size}s"
+        return os.path.join(self.directory, f"{channel.replace('/', '_')}.{level}.bin")
+
+    def _series(self, channel, size):
+        key = (channel, size)
+        series = self.series.get(key)
+        if series is None:
+            dtype = RAW_DTYPE if size == 0 else BUCKET_DTYPE
+            series = Series(self._path(channel, size), dtype, self.levels[size],
+                            self.disk_retention.get(size))
+            self.series[key] = series
+        return series
+
+    # ---------------- Updates ----------------
+    def add(self, t, named_values):
+        if hasattr(t, "timestamp"):
+            t = t.timestamp()
+
+        with self.lock:
+            for name, raw in named_values.items():
+                try:
+                    value = float(raw)
+                except (TypeError, ValueError):
+                    continue
+                if not math.isfinite(value) or value < -9:
+                    continue
+                self._add_sample(name.replace(" [K]", ""), t, value)
+
+            if time.monotonic() - self.last_flush >= self.flush_interval:
+                self._flush()
+
+    def _add_sample(self, channel, t, value):
+        for size in self.levels:
+            if size == 0:
+                self._series(channel, 0).append((t, value))
+                continue
+
+            start = t - t % size
+            bucket = self.open.get((channel, size))
+            if bucket is not None and bucket[0] == start:
+                bucket[1] = min(bucket[1], value)
+                bucket[2] = max(bucket[2], value)
+                bucket[3] += value
+                bucket[4] = value
+                bucket[5] += 1
+                continue
+
+            if bucket is not None:
+                self._series(channel, size).append(self._row(bucket))
+            self.open[(channel, size)] = [start, value, value, value, value, 1]
+
+    @staticmethod
+    def _row(bucket):
+        start, lo, hi, total, last, count = bucket
+        return (start, lo, hi, total / count, last, count)
+
+    def flush(self):
+        with self.lock:
+            self._flush()
+
+    def _flush(self):
+        for series in self.series.values():
+            series.flush()
+        self.last_flush = time.monotonic()
+
+    # ---------------- Queries ----------------
+    def channels(self):
+        names = {f[:-len(".raw.bin")] for f in os.listdir(self.directory) if f.endswith(".raw.bin")}
+        with self.lock:
+            names.update(channel for channel, _ in self.series)
+        return sorted(names)
+
+    def first_time(self, channel, level=0):
+        """Start of the oldest stored row of `channel` at `level`, or None."""
+        dtype = RAW_DTYPE if level == 0 else BUCKET_DTYPE
+        with self.lock:
+            path = self._path(channel, level)
+            if os.path.exists(path) and os.path.getsize(path) >= dtype.itemsize:
+                return float(np.fromfile(path, dtype=dtype, count=1)["t"][0])
+            series = self.series.get((channel, level))
+            return series.times[0] if series is not None and series.times else None
+
+    def pick_level(self, start, end, points):
+        """Largest bucket size giving at least `points` buckets over the range."""
+        best = 0
+        for size in self.levels:
+            if size and (end - start) / size >= points:
+                best = size
+        return best
+
+    def query(self, channel, start, end, points=1000, level=None):
+        """
+        Aggregates of `channel` for start <= t < end (unix seconds).
+        Returns {"level": bucket size (0 = raw), "times", "min", "max",
+        "mean", "last"} as numpy arrays.
+        """
+        size = self.pick_level(start, end, points) if level is None else level
+
+        with self.lock:
+            if (channel, size) in self.series or os.path.exists(self._path(channel, size)):
+                rows = self._series(channel, size).range(start, end)
+            else:
+                rows = np.array([], dtype=RAW_DTYPE if size == 0 else BUCKET_DTYPE)
+
+            bucket = self.open.get((channel, size)) if size else None
+            if bucket is not None and start <= bucket[0] < end:
+                rows = np.concatenate([rows, np.array([self._row(bucket)], dtype=BUCKET_DTYPE)])
+
+        if size == 0:
+            values = rows["value"]
+            return {"level": 0, "times": rows["t"], "min": values, "max": values,
+                    "mean": values, "last": values}
+        return {"level": size, "times": rows["t"], "min": rows["min"], "max": rows["max"],
+                "mean": rows["mean"], "last": rows["last"]}
+
+    def close(self):
+        self.flush()
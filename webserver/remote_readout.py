@@ -3,6 +3,8 @@ import time
 import copy
 import datetime
 import queue
+import socket
+import json
 
 plot_data = {
     "CTC100A": {"times": [], "4switchA": [], "4pumpA": [], "3switchA": [], "3pumpA": []},
@@ -31,14 +33,14 @@ channel_names = [
     "Still [K]"
 ]
 
-class DBReader(threading.Thread):
-    def __init__(self, sql, plot_queue, channel_names=channel_names, interval=2.0):
-        super().__init__(daemon=True)
+class PlotBuffer:
+    """
+    Aligned, forward-filled plot state shared by DBReader and LiveReader.
+    state[device]["times"] holds datetimes, state[device][channel] the values.
+    """
 
-        self.sql = sql
+    def __init__(self, channel_names=channel_names):
         self.channel_names = channel_names
-        self.plot_queue = plot_queue
-        self.interval = interval
 
         # strip " [K]"
         self.clean_names = {name: name.replace(" [K]", "") for name in channel_names}
@@ -51,12 +53,6 @@ class DBReader(threading.Thread):
             if ch != "times"
         }
 
-        # SCID lookup
-        self.scids = {name: sql.getSCID(name) for name in channel_names}
-
-        last = sql.lastUpdate()
-        self.last_timestamp = int(last.timestamp()) if last else 0
-
         # working state
         self.state = copy.deepcopy(plot_data)
 
@@ -68,8 +64,122 @@ class DBReader(threading.Thread):
             if ch != "times"
         }
 
+    def append(self, t, named_values):
+        """
+        Append one aligned sample at time t.
+        named_values maps full channel names (e.g. "MC [K]") to raw values.
+        """
+        # Read new values
+        for full_name, raw in named_values.items():
+            clean = self.clean_names.get(full_name, full_name.replace(" [K]", ""))
+            dev = self.device_map.get(clean)
+            if not dev:
+                continue
+
+            try:
+                val = float(raw)
+            except (TypeError, ValueError):
+                continue
+
+            if val < -9:
+                continue
+
+            self.last_values[(dev, clean)] = val
+
+        # Append aligned values (forward fill)
+        for dev, chans in self.state.items():
+            if dev == "times":
+                continue
+
+            self.state[dev]["times"].append(t)
+
+            for ch in chans:
+                if ch == "times":
+                    continue
+
+                val = self.last_values[(dev, ch)]
+                if val is not None:
+                    self.state[dev][ch].append(val)
+                else:
+                    # still no data yet -> repeat or skip
+                    if self.state[dev][ch]:
+                        self.state[dev][ch].append(self.state[dev][ch][-1])
+
+    def snapshot(self):
+        return copy.deepcopy(self.state)
+
+def preload_history(buffer, sql, scids, hours, readings=None):
+    """
+    Fill `buffer` with the last `hours` of every channel from one bulk query.
+    scids maps full channel names to SCIDs. Returns the newest sample time
+    loaded (unix seconds), or None if there was nothing.
+    """
+    end = time.time()
+    rows = sql.getSCRange([scid for scid in scids.values() if scid >= 0], end - hours * 3600, end)
+
+    # readings of one read cycle share a timestamp; regroup them per sample
+    samples = {}
+    for name, scid in scids.items():
+        series = rows.get(scid)
+        if not series:
+            continue
+        for t, value in zip(series["times"], series["last"]):
+            samples.setdefault(t, {})[name] = value
+
+    # timezone-aware like the timestamptz values DBReader polls, so the
+    # preloaded and the live samples can share one buffer
+    for t in sorted(samples):
+        dt = datetime.datetime.fromtimestamp(t, tz=datetime.timezone.utc)
+        buffer.append(dt, samples[t])
+        if readings is not None:
+            readings.update(dt, samples[t])
+
+    print(f"[Preload] {len(samples)} samples from the last {hours:g} h")
+    return max(samples) if samples else None
+
+class DBReader(threading.Thread):
+    def __init__(self, sql, plot_queue, channel_names=channel_names, interval=2.0, readings=None,
+                 pyramid=None, preload_hours=0):
+        super().__init__(daemon=True)
+
+        self.sql = sql
+        self.channel_names = channel_names
+        self.plot_queue = plot_queue
+        self.interval = interval
+
+        self.buffer = PlotBuffer(channel_names)
+
+        # optional ReadingWatch for condition-driven algorithm steps
+        self.readings = readings
+        # optional TimeSeriesPyramid for history queries
+        self.pyramid = pyramid
+        # hours of history loaded into the plots before polling starts
+        self.preload_hours = preload_hours
+
+        # SCID lookup
+        self.scids = {name: sql.getSCID(name) for name in channel_names}
+
+        last = sql.lastUpdate()
+        self.last_timestamp = int(last.timestamp()) if last else 0
+
+    def preload(self):
+        try:
+            newest = preload_history(self.buffer, self.sql, self.scids, self.preload_hours,
+                                     self.readings)
+        except Exception as e:
+            print("[DBReader] Preload failed:", e)
+            return
+        finally:
+            # end the read transaction before polling starts
+            self.sql.rollback()
+        if newest is not None:
+            self.last_timestamp = max(self.last_timestamp, int(newest))
+            self.plot_queue.put(self.buffer.snapshot())
+
     def run(self):
         print("[DBReader] Starting DB poll thread (aligned mode).")
+        if self.preload_hours:
+            self.preload()
 
         while True:
             try:
@@ -89,54 +199,105 @@ class DBReader(threading.Thread):
                 record = rows[0]
                 t = record["time"]
 
-                # Track which channels updated this cycle
-                updated = set()
+                named_values = {
+                    full_name: record.get(f"value-{i+1}")
+                    for i, full_name in enumerate(self.channel_names)
+                }
+                self.buffer.append(t, named_values)
+                if self.readings is not None:
+                    self.readings.update(t, named_values)
+                if self.pyramid is not None:
+                    self.pyramid.add(t, named_values)
 
-                # Read DB values
-                for i, full_name in enumerate(self.channel_names):
-                    clean = self.clean_names[full_name]
-                    dev = self.device_map.get(clean)
-                    if not dev:
-                        continue
+                # Emit snapshot
+                self.plot_queue.put(self.buffer.snapshot())
+                self.last_timestamp = t
 
-                    raw = record.get(f"value-{i+1}")
-                    try:
-                        val = float(raw)
-                    except:
-                        continue
+            except Exception as e:
+                self.sql.db.rollback()
+                print("[DBReader] ERROR:", e)
 
-                    if val < -9:
-                        continue
+            time.sleep(self.interval)
 
-                    self.last_values[(dev, clean)] = val
-                    updated.add((dev, clean))
+class LiveReader(threading.Thread):
+    """
+    Subscribes to the reading stream published by the hardware host over the
+    control socket and feeds the same plot snapshots as DBReader, without
+    touching the database.
+    """
 
-                # Append aligned values (forward fill)
-                for dev, chans in self.state.items():
-                    if dev == "times":
-                        continue
+    def __init__(self, host, port, plot_queue, channel_names=channel_names, retry_interval=5.0,
+                 readings=None, pyramid=None, sql=None, preload_hours=0, read_timeout=30.0):
+        super().__init__(daemon=True)
 
-                    self.state[dev]["times"].append(t)
+        self.host = host
+        self.port = port
+        self.plot_queue = plot_queue
+        self.retry_interval = retry_interval
+        # a silent stream for this long (half-open connection, stalled
+        # hardware host) is dropped and resubscribed
+        self.read_timeout = read_timeout
+        self.channel_names = channel_names
 
-                    for ch in chans:
-                        if ch == "times":
-                            continue
+        # optional warm start from the database before subscribing
+        self.sql = sql
+        self.preload_hours = preload_hours
 
-                        val = self.last_values[(dev, ch)]
-                        if val is not None:
-                            self.state[dev][ch].append(val)
-                        else:
-                            # still no data yet -> repeat or skip
-                            if self.state[dev][ch]:
-                                self.state[dev][ch].append(self.state[dev][ch][-1])
+        self.buffer = PlotBuffer(channel_names)
 
-                # Emit snapshot
-                self.plot_queue.put(copy.deepcopy(self.state))
-                self.last_timestamp = t
+        # optional ReadingWatch for condition-driven algorithm steps
+        self.readings = readings
+        # optional TimeSeriesPyramid for history queries
+        self.pyramid = pyramid
 
-            except Exception as e:
-                self.sql.db.rollback()
-                print("[DBReader] ERROR:", e)
+    def handle_message(self, msg):
+        t = datetime.datetime.fromtimestamp(msg["time"], tz=datetime.timezone.utc)
 
-            time.sleep(self.interval)
+        named_values = {}
+        for channel_dict in msg["readings"].values():
+            named_values.update(channel_dict)
+
+        self.buffer.append(t, named_values)
+        if self.readings is not None:
+            self.readings.update(t, named_values)
+        if self.pyramid is not None:
+            self.pyramid.add(t, named_values)
+        self.plot_queue.put(self.buffer.snapshot())
+
+    def preload(self):
+        # the database is only used here: hand the connection back to the
+        # pool (ending the read transaction) once the preload is done
+        try:
+            with self.sql.connection():
+                scids = {name: self.sql.getSCID(name) for name in self.channel_names}
+                if preload_history(self.buffer, self.sql, scids, self.preload_hours,
+                                   self.readings) is not None:
+                    self.plot_queue.put(self.buffer.snapshot())
+        except Exception as e:
+            print("[LiveReader] Preload failed:", e)
+
+    def run(self):
+        if self.sql is not None and self.preload_hours:
+            self.preload()
+
+        print("[LiveReader] Subscribing to live readings.")
+
+        while True:
+            try:
+                with socket.create_connection((self.host, self.port), timeout=2.0) as s:
+                    s.sendall(b"subscribe _ _ _\n")
+
+                    # readings arrive every few seconds
+                    s.settimeout(self.read_timeout)
+                    with s.makefile("r", encoding="ascii") as stream:
+                        for line in stream:
+                            if line.strip():
+                                self.handle_message(json.loads(line))
+
+                print("[LiveReader] Stream closed by hardware host.")
+            except socket.timeout:
+                print(f"[LiveReader] No readings for {self.read_timeout:g} s, reconnecting.")
+            except Exception as e:
+                print("[LiveReader] ERROR:", e)
 
+            time.sleep(self.retry_interval)
@@ -11,7 +11,7 @@ Flask app that:
 """
 
 from flask import Flask, render_template, request, jsonify, Response
-import threading, time, io
+import threading, time
 import random
 import sys
 
@@ -25,12 +25,12 @@ from hardware_reader import HardwareTemperatureReader
 from controller import hardware_lock
 from controller import DeviceController
 from device import connect_devices
+from trend import TrendSet
+from plot_renderer import PlotRenderer
 
 import matplotlib
 matplotlib.use("Agg")   # non-GUI backend, works for generating PNGs in the background
 
-import matplotlib.pyplot as plt
-
 # Global dictionary storing last set values for all devices/channels
 # Keys are tuples: (device_name, channel_name)
 LAST_VALUES = {}
@@ -231,6 +231,9 @@ print("Dynamic PLOT_MAPPING:", PLOT_MAPPING)
 
 plot_lock = threading.Lock()
 
+# per-channel slope/noise estimates for the plot legends
+trends = TrendSet()
+
 def background_update_thread():
     start_time = time.time()
 
@@ -255,6 +258,8 @@ def background_update_thread():
                     if ch not in plot_data[dev_name]:
                         plot_data[dev_name][ch] = []
                     plot_data[dev_name][ch].append(value)
+                    if isinstance(value, (int, float)):
+                        trends.update(t, {ch: value})
 
                 # window = 300 seconds
                 window = 300
@@ -300,58 +305,30 @@ def plot_png(plot_id):
 
 
 
+def plot_snapshot():
+    with plot_lock:
+        return {dev: {k: list(v) for k, v in chans.items()} for dev, chans in plot_data.items()}
+
+def trend_snapshot(ch):
+    with plot_lock:
+        estimator = trends.get(ch)
+        return estimator.snapshot() if estimator else None
+
+# persistent figures rendered in the background, requests copy the PNG
+plot_renderer = PlotRenderer(PLOT_MAPPING, plot_snapshot, trend=trend_snapshot)
+plot_renderer.start()
+
 # Backwards-compatible small endpoint returning the 4 numeric single traces (if you still want them)
 @app.route("/plot/<int:plot_id>.png")
 def plot_png(plot_id):
     if plot_id not in PLOT_MAPPING:
         return "Invalid plot ID", 404
 
-    device, channels = PLOT_MAPPING[plot_id]
-
-    with plot_lock:
-        times = plot_data.get(device, {}).get("times", [])
-        ys_dict = {ch: plot_data[device].get(ch, []) for ch in channels}
-
-    buf = io.BytesIO()
-    fig, ax = plt.subplots(figsize=(6, 3))
-
-    ax.set_xlabel("Time (s)")
-    ax.set_ylabel("Temperature (K)")
-    ax.grid(True)
-    ax.set_title(f"{device}")
-
-    for ch, ys in ys_dict.items():
-        if times and ys:
-            ax.plot(times, ys, label=ch)
-
-    leg = ax.legend(
-        loc='upper left',
-        bbox_to_anchor=(1.02, 1),
-        fontsize = 'small'
-    )
-
-    label_to_index = {t.get_text(): i for i, t in enumerate(leg.texts)}
-
-    for ch, ys in ys_dict.items():
-        if times and ys:
-            current_temp = ys[-1]
-            idx = label_to_index[ch]
-            if len(times)>11:
-                grad = (ys[-1] - ys[-10]) / (times[-1] - times[-10])
-                leg.texts[idx].set_text(
-                f"{ch}\n {current_temp:.3f}K\n {grad:2f}K/min"
-                )
-            else:
-                leg.texts[idx].set_text(
-                f"{ch}\n {current_temp:.3f}K"
-                )
+    png = plot_renderer.get_png(plot_id)
+    if png is None:
+        return "No data yet", 503
 
-    fig.tight_layout()
-    fig.savefig(buf, format="png")
-    plt.close(fig)
-
-    buf.seek(0)
-    return Response(buf.getvalue(), mimetype="image/png")
+    return Response(png, mimetype="image/png")
 
 
 # -------------------------
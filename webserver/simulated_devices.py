@@ -0,0 +1,409 @@
+"""
+Simulated CTC100 / LakeShore 224 / LakeShore 372 backends.
+
+The simulated devices expose the same methods as CTC100Device,
+LakeShore224Device and LakeShore372Device, so they can be dropped into
+connect_devices(), the controller and the readout without changes. Every
+"serial" call waits a configurable latency (+ jitter) and can fail at a
+configurable rate. Temperatures come from a shared FridgeModel, a crude
+first-order thermal model of the two 7He sides and the dilution unit.
+
+Not a physical model of the fridge: it is only meant to respond in the
+right direction and on roughly the right time scales for benchmarking and
+exercising the control paths without hardware.
+"""
+import math
+import random
+import threading
+import time
+
+# ---------------- Thermal model ----------------
+SIDES = ("A", "B")
+
+def _relax(value, target, tau, dt):
+    """First-order relaxation of value towards target with time constant tau."""
+    return target + (value - target) * math.exp(-dt / tau)
+
+class FridgeModel:
+    """
+    Shared thermal state of the fridge, advanced lazily to clock().
+
+    Per side X the nodes are 4pumpX, 3pumpX, 4switchX, 3switchX, 4HePotX and
+    3HePotX; shared nodes are Condenser, 50K, 4K, MC and Still. Pump heaters
+    (PID to setpoint) and switch heaters (AIO voltage) drive the model.
+    """
+
+    MAX_STEP = 1.0  # seconds per integration step
+
+    def __init__(self, clock=time.time, noise=1e-3):
+        self.clock = clock
+        self.noise = noise
+        self.lock = threading.RLock()
+        self.last_time = clock()
+
+        self.T = {"Condenser": 2.5, "50K": 45.0, "4K": 3.2, "MC": 0.05, "Still": 0.7}
+        self.heaters = {}   # (side, "4puheat") -> {"pid": bool, "setpoint": K, "output": W}
+        self.aio = {}       # (side, channel) -> {"iotype": str, "voltage": V}
+        self.charge = {}    # (side, "4"/"3") -> liquid fraction 0..1
+        self.still_percent = 0.0
+
+        for s in SIDES:
+            self.T.update({
+                f"4pump{s}": 4.5, f"3pump{s}": 4.5,
+                f"4switch{s}": 4.2, f"3switch{s}": 4.2,
+                f"4HePot{s}": 3.0, f"3HePot{s}": 3.0,
+            })
+            for ch in ("4puheat", "3puheat"):
+                self.heaters[(s, ch)] = {"pid": False, "setpoint": 0.0, "output": 0.0}
+            for ch in ("4swheat", "3swheat", "AIO3", "AIO4"):
+                self.aio[(s, ch)] = {"iotype": "Set out", "voltage": 0.0}
+            self.charge[(s, "4")] = 0.0
+            self.charge[(s, "3")] = 0.0
+
+    # ---------------- Integration ----------------
+    def advance(self):
+        with self.lock:
+            now = self.clock()
+            dt = now - self.last_time
+            self.last_time = now
+            while dt > 0:
+                step = min(dt, self.MAX_STEP)
+                self.step(step)
+                dt -= step
+
+    def step(self, dt):
+        T = self.T
+        for s in SIDES:
+            for n in ("4", "3"):
+                heater = self.heaters[(s, f"{n}puheat")]
+                voltage = self.aio[(s, f"{n}swheat")]["voltage"]
+                pump, switch = f"{n}pump{s}", f"{n}switch{s}"
+
+                # switch heater makes the gas-gap switch conduct
+                T[switch] = _relax(T[switch], 4.2 + 2.5 * max(voltage, 0.0), 60.0, dt)
+                conducting = T[switch] > 12.0
+
+                if heater["pid"]:
+                    T[pump] = _relax(T[pump], heater["setpoint"], 150.0, dt)
+                    heater["output"] = min(1.8, max(0.0, 0.3 + 0.05 * (heater["setpoint"] - T[pump])))
+                elif conducting:
+                    T[pump] = _relax(T[pump], 4.2, 300.0, dt)
+                else:
+                    T[pump] = _relax(T[pump], 10.0, 1800.0, dt)
+
+            # 4He stage: condenses while its pump is hot, pumps while cold
+            head4, key4 = f"4HePot{s}", (s, "4")
+            if T[f"4pump{s}"] > 35.0:
+                self.charge[key4] = min(1.0, self.charge[key4] + dt / 1200.0)
+                T[head4] = _relax(T[head4], 3.0, 300.0, dt)
+            elif T[f"4pump{s}"] < 15.0 and self.charge[key4] > 0:
+                self.charge[key4] = max(0.0, self.charge[key4] - dt / 14400.0)
+                T[head4] = _relax(T[head4], 0.8, 300.0, dt)
+            else:
+                T[head4] = _relax(T[head4], 4.0, 600.0, dt)
+
+            # 3He stage: needs a cold 4He head to condense
+            head3, key3 = f"3HePot{s}", (s, "3")
+            if T[f"3pump{s}"] > 35.0:
+                if T[head4] < 2.0:
+                    self.charge[key3] = min(1.0, self.charge[key3] + dt / 600.0)
+                T[head3] = _relax(T[head3], T[head4] + 0.2, 300.0, dt)
+            elif T[f"3pump{s}"] < 15.0 and self.charge[key3] > 0 and T[head4] < 2.0:
+                self.charge[key3] = max(0.0, self.charge[key3] - dt / 10800.0)
+                T[head3] = _relax(T[head3], 0.35, 300.0, dt)
+            else:
+                T[head3] = _relax(T[head3], T[head4] + 0.3, 600.0, dt)
+
+        coldest_3 = min(T[f"3HePot{s}"] for s in SIDES)
+        coldest_4 = min(T[f"4HePot{s}"] for s in SIDES)
+        T["Condenser"] = _relax(T["Condenser"], 1.0 + 0.5 * coldest_4, 300.0, dt)
+        T["MC"] = _relax(
+            T["MC"],
+            0.03 + 0.3 * max(0.0, coldest_3 - 0.3) + 0.0005 * self.still_percent,
+            600.0, dt
+        )
+        T["Still"] = _relax(T["Still"], 0.6 + 0.005 * self.still_percent, 300.0, dt)
+
+    # ---------------- Accessors ----------------
+    def read(self, node):
+        with self.lock:
+            self.advance()
+            value = self.T[node]
+        return value * (1.0 + random.gauss(0.0, self.noise))
+
+# ---------------- Serial behaviour ----------------
+class SimulatedSerial:
+    """Latency, jitter and failure injection shared by the simulated devices."""
+
+    def __init__(self, latency=0.05, jitter=0.02, failure_rate=0.0, sleep=time.sleep):
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.sleep = sleep
+
+    def io(self):
+        delay = self.latency + random.uniform(0.0, self.jitter)
+        if delay > 0:
+            self.sleep(delay)
+        if self.failure_rate and random.random() < self.failure_rate:
+            raise RuntimeError("Simulated serial failure")
+
+# ---------------- CTC100 ----------------
+class SimulatedCTC100Device:
+    """Simulated CTC100 for one 7He side ("A" or "B")."""
+
+    INPUTS = {"4switch": "4switch", "4pump": "4pump", "3switch": "3switch", "3pump": "3pump"}
+
+    def __init__(self, side, model: FridgeModel, name=None, **serial_options):
+        self.side = side
+        self.model = model
+        self.serial = SimulatedSerial(**serial_options)
+        self.port = f"sim-{side}"
+        self.address = self.port
+        self.name = name or f"CTC100{side}"
+        self.input_channels = list(self.INPUTS)
+        self.output_channels = ["4puheat", "3puheat"]
+        self.aio_channels = ["4swheat", "3swheat", "AIO3", "AIO4"]
+
+    def _node(self, channel):
+        return f"{self.INPUTS[channel]}{self.side}"
+
+    def _heater(self, channel):
+        return self.model.heaters[(self.side, channel)]
+
+    def _aio(self, channel):
+        return self.model.aio[(self.side, channel)]
+
+    # ---------------- Readout ----------------
+    def get_temperature(self, channel):
+        try:
+            return self.read(channel)
+        except Exception as e:
+            print(f"Error reading temperature from CTC100 (Channel {channel}): {e}")
+            return None
+
+    def read(self, channel):
+        self.serial.io()
+        if channel in self.INPUTS:
+            return self.model.read(self._node(channel))
+        if channel in self.output_channels:
+            return self.get_output(channel)
+        if channel in self.aio_channels:
+            return self._aio(channel)["voltage"]
+        raise RuntimeError(f"Unable to read from channel {channel}")
+
+    def read_all_channels(self):
+        return {ch: self.get_temperature(ch) for ch in self.input_channels + self.aio_channels}
+
+    def read_status(self):
+        self.serial.io()
+        return "OK"
+
+    # ---------------- Heaters ----------------
+    def enable_heater(self):
+        self.serial.io()
+
+    def disable_heater(self):
+        self.serial.io()
+
+    def set_heater_output(self, channel, value=0.0):
+        self.serial.io()
+        with self.model.lock:
+            self.model.advance()
+            self._heater(channel)["output"] = float(value)
+        return True
+
+    def get_output(self, channel):
+        with self.model.lock:
+            self.model.advance()
+            return self._heater(channel)["output"]
+
+    def set_PID_mode(self, channel, mode):
+        if mode not in ['Off', 'On', 'Follow']:
+            raise ValueError(
+                "Invalid control mode. Must be 'Off', 'On', or 'Follow'.")
+        self.serial.io()
+        with self.model.lock:
+            self.model.advance()
+            self._heater(channel)["pid"] = mode == "On"
+
+    def enable_PID(self, channel):
+        self.set_PID_mode(channel, 'On')
+
+    def disable_PID(self, channel):
+        self.set_PID_mode(channel, 'Off')
+
+    def read_PID_mode(self, channel):
+        self.serial.io()
+        return "On" if self._heater(channel)["pid"] else "Off"
+
+    def write_setpoint(self, channel, setpoint):
+        self.serial.io()
+        with self.model.lock:
+            self.model.advance()
+            self._heater(channel)["setpoint"] = float(setpoint)
+
+    def read_setpoint(self, channel):
+        self.serial.io()
+        return self._heater(channel)["setpoint"]
+
+    # ---------------- AIO ----------------
+    def get_aio_iotype(self, channel):
+        self.serial.io()
+        return self._aio(channel)["iotype"]
+
+    def set_aio_iotype(self, channel, iotype):
+        # exactly what CTC100Device accepts; the device reads back 'Set out'
+        valid_iotypes = ['Input', 'Set Out', 'Meas out']
+        if iotype not in valid_iotypes:
+            raise ValueError(
+                f"Invalid IOType. Must be one of {valid_iotypes}.")
+        self.serial.io()
+        self._aio(channel)["iotype"] = 'Set out' if iotype == 'Set Out' else iotype
+
+    def get_aio_voltage(self, channel):
+        iotype = self.get_aio_iotype(channel)
+        if iotype != 'Set out':
+            raise RuntimeError(
+                f"{channel} is not configured as 'Set out'. Current IOType: {iotype}")
+        self.serial.io()
+        return self._aio(channel)["voltage"]
+
+    def set_aio_voltage(self, channel, voltage):
+        if not (-10.0 <= voltage <= 10.0):
+            raise ValueError("Voltage must be between -10 and +10 volts.")
+        iotype = self.get_aio_iotype(channel)
+        if iotype != 'Set out':
+            raise RuntimeError(
+                f"{channel} is not configured as 'Set out'. Current IOType: {iotype}")
+        self.serial.io()
+        with self.model.lock:
+            self.model.advance()
+            self._aio(channel)["voltage"] = float(voltage)
+
+    # ---------------- Channel lists ----------------
+    def get_input_channels(self):
+        return self.input_channels
+
+    def get_output_channels(self):
+        return self.output_channels
+
+    def get_aio_channels(self):
+        return self.aio_channels
+
+# ---------------- LakeShore 224 ----------------
+class SimulatedLakeShore224Device:
+    CHANNELS = {
+        "C1": "4HePotA", "B": "3HePotA",
+        "C2": "4HePotB", "D1": "3HePotB",
+        "A": "Condenser", "D2": "50K", "D3": "4K",
+    }
+
+    def __init__(self, model: FridgeModel, name=None, **serial_options):
+        self.model = model
+        self.serial = SimulatedSerial(**serial_options)
+        self.port = "sim-224"
+        self.address = self.port
+        self.name = name or "Lakeshore224"
+        self.input_channels = ['A', 'B'] + \
+            [f'C{i}' for i in range(1, 6)] + [f'D{i}' for i in range(1, 6)]
+
+    def get_input_channels(self):
+        return self.input_channels
+
+    def get_output_channels(self):
+        return []
+
+    def get_temperature(self, channel):
+        try:
+            self.serial.io()
+            return self.model.read(self.CHANNELS.get(channel, "4K"))
+        except Exception as e:
+            print(
+                f"Error reading temperature from Lake Shore 224 (Channel {channel}): {e}"
+            )
+            return None
+
+    def read_all_channels(self):
+        return {ch: self.get_temperature(ch) for ch in self.input_channels}
+
+# ---------------- LakeShore 372 ----------------
+class SimulatedLakeShore372Device:
+    CHANNELS = {"1": "MC", "A": "Still"}
+
+    def __init__(self, model: FridgeModel, name=None, **serial_options):
+        self.model = model
+        self.serial = SimulatedSerial(**serial_options)
+        self.port = "sim-372"
+        self.address = self.port
+        self.name = name or "Lakeshore372"
+        self.input_channels = [str(i) for i in range(1, 17)] + ['A']
+        self.output_channels = ['sample_heater', 'still_heater']
+        self.mc_setpoint = 0.0
+
+    def get_input_channels(self):
+        return self.input_channels
+
+    def get_output_channels(self):
+        return self.output_channels
+
+    def get_temperature(self, channel):
+        try:
+            self.serial.io()
+            return self.model.read(self.CHANNELS.get(str(channel), "MC"))
+        except Exception as e:
+            print(
+                f"Error reading temperature from Lake Shore 372 (Channel {channel}): {e}"
+            )
+            return None
+
+    def get_sensor(self, channel):
+        temp = self.get_temperature(channel)
+        return None if temp is None else 1000.0 / max(temp, 1e-3)
+
+    def read_all_channels(self):
+        return {ch: self.get_temperature(ch) for ch in self.input_channels}
+
+    def sample_heater_output_percentage(self):
+        self.serial.io()
+        return 0.0
+
+    def still_heater_output_query(self):
+        self.serial.io()
+        return self.model.still_percent
+
+    def get_output(self, channel):
+        if channel == 'sample_heater':
+            return self.sample_heater_output_percentage()
+        elif channel == 'still_heater':
+            return self.still_heater_output_query()
+
+    def set_still_voltage(self, voltage_percentage):
+        self.serial.io()
+        with self.model.lock:
+            self.model.advance()
+            self.model.still_percent = float(voltage_percentage)
+
+    def set_MC_setpoint(self, setpoint):
+        self.serial.io()
+        self.mc_setpoint = setpoint
+
+    def MC_heater_turn_off(self):
+        self.serial.io()
+
+# ---------------- Factory ----------------
+def connect_simulated_devices(model=None, **serial_options):
+    """
+    Build the same name->device dict as connect_devices(), backed by one
+    shared FridgeModel. serial_options (latency, jitter, failure_rate,
+    sleep) are passed to every device.
+    """
+    if model is None:
+        model = FridgeModel()
+
+    return {
+        "CTC100A": SimulatedCTC100Device("A", model, name="CTC100A", **serial_options),
+        "CTC100B": SimulatedCTC100Device("B", model, name="CTC100B", **serial_options),
+        "Lakeshore224": SimulatedLakeShore224Device(model, name="Lakeshore224", **serial_options),
+        "Lakeshore372": SimulatedLakeShore372Device(model, name="Lakeshore372", **serial_options),
+    }
@@ -0,0 +1,144 @@
+import datetime
+import glob
+import os
+import threading
+import time
+
+DEFAULT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "spool")
+
+# ---------------- Spool file ----------------
+class Spool:
+    """
+    Append-only on-disk buffer for readings the database did not take.
+
+    One line per reading: "<iso time>\\t<name>\\t<value>". Lines are flushed
+    on every append and fsynced in batches, at most every `fsync_interval`
+    seconds. take() moves the current file aside (*.replay) for the
+    replayer, so appending never waits on a replay in progress.
+    """
+
+    def __init__(self, directory=DEFAULT_DIR, fsync_interval=10.0):
+        self.directory = directory
+        self.path = os.path.join(directory, "current.spool")
+        self.fsync_interval = fsync_interval
+        self.lock = threading.Lock()
+        self.file = None
+        self.unsynced = False
+        self.last_sync = time.monotonic()
+
+        os.makedirs(directory, exist_ok=True)
+
+    def append(self, rows):
+        """rows: [(name, value, datetime)]"""
+        with self.lock:
+            if self.file is None:
+                self.file = open(self.path, "a")
+                # start a fresh line after a torn one left by a crash
+                if self.file.tell() > 0:
+                    with open(self.path, "rb") as f:
+                        f.seek(-1, os.SEEK_END)
+                        if f.read(1) != b"\n":
+                            self.file.write("\n")
+            for name, value, timestamp in rows:
+                self.file.write(f"{timestamp.isoformat()}\t{name}\t{value!r}\n")
+            self.file.flush()
+            self.unsynced = True
+            if time.monotonic() - self.last_sync >= self.fsync_interval:
+                self._sync()
+
+    def _sync(self):
+        if self.file is not None and self.unsynced:
+            os.fsync(self.file.fileno())
+            self.unsynced = False
+        self.last_sync = time.monotonic()
+
+    def sync(self):
+        with self.lock:
+            self._sync()
+
+    def take(self):
+        """Rotate the current file out; returns replay files, oldest first."""
+        with self.lock:
+            if self.file is not None:
+                self._sync()
+                self.file.close()
+                self.file = None
+            if os.path.exists(self.path) and os.path.getsize(self.path) > 0:
+                os.replace(self.path, os.path.join(self.directory, f"{time.time_ns()}.replay"))
+        return sorted(glob.glob(os.path.join(self.directory, "*.replay")))
+
+    def pending(self):
+        with self.lock:
+            if os.path.exists(self.path) and os.path.getsize(self.path) > 0:
+                return True
+        return bool(glob.glob(os.path.join(self.directory, "*.replay")))
+
+    @staticmethod
+    def read(path):
+        rows = []
+        with open(path) as f:
+            for line in f:
+                # a torn last line (crash mid-write) is dropped
+                parts = line.rstrip("\n").split("\t")
+                if len(parts) != 3 or not line.endswith("\n"):
+                    continue
+                try:
+                    rows.append((parts[1], float(parts[2]), datetime.datetime.fromisoformat(parts[0])))
+                except ValueError:
+                    continue
+        return rows
+
+    def close(self):
+        with self.lock:
+            self._sync()
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+
+# ---------------- Replayer ----------------
+class SpoolReplayer(threading.Thread):
+    """
+    Bulk-loads spooled readings once the database is reachable again, one
+    file per transaction; a file is deleted only after its commit. Also
+    refreshes the rollups over the replayed span, which the incremental
+    rollup update would otherwise skip.
+    """
+
+    def __init__(self, spool: Spool, sql, interval=30.0):
+        super().__init__(daemon=True)
+        self.spool = spool
+        self.sql = sql
+        self.interval = interval
+        self._stop_event = threading.Event()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def replay(self):
+        if not self.spool.pending():
+            return
+        if not self.sql.connected() and not self.sql.reconnect():
+            return
+
+        for path in self.spool.take():
+            rows = Spool.read(path)
+            if rows and not self.sql.insertSCValues(rows):
+                print(f"[SpoolReplayer] Database still unavailable, keeping {os.path.basename(path)}")
+                self.sql.reconnect()
+                return
+            os.remove(path)
+            if rows:
+                print(f"[SpoolReplayer] Replayed {len(rows)} readings from {os.path.basename(path)}")
+                self.sql.updateRollups(since=min(timestamp for _, _, timestamp in rows))
+
+    def run(self):
+        print("[SpoolReplayer] Started.")
+        while not self._stop_event.is_set():
+            self.spool.sync()
+            try:
+                self.replay()
+            except Exception as e:
+                print("[SpoolReplayer] ERROR during replay:", e)
+            self._stop_event.wait(self.interval)
+        self.spool.close()
+        print("[SpoolReplayer] Stopped.")
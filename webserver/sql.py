@@ -1,27 +1,199 @@
 import psycopg2
+import psycopg2.extras
+import psycopg2.pool
 import datetime
+import threading
 import time
+from contextlib import contextmanager
 import numpy as np
 
 def dateFromTimeStamp(time,format):
     return datetime.datetime.fromtimestamp(int(time)).strftime(format)
 
 class SQL:
-    def __init__(self,debug,options):
+    """
+    Access to the slow control database through a pool of up to
+    `pool_size` connections.
+
+    Every thread gets its own connection (and cursor): `db` and `DBconn`
+    resolve to the calling thread's pair, checked out of the pool on first
+    use and returned when the thread has ended. Short-lived threads such
+    as web request handlers should use `with sql.connection():` (or
+    `with sql.transaction() as cursor:`) so the connection goes back to
+    the pool at the end of the block.
+
+    With autocommit=True (read-only users such as the web server) every
+    statement is its own transaction, so idle readers never hold locks
+    that block partition maintenance.
+    """
+
+    def __init__(self,debug,options,pool_size=4,autocommit=False):
         self.Debug = debug
         host = options[0]
         user = options[1]
         port = int(options[2])
         db = options[3]
         print("SQL: Connecting to postgres database = %s with username = %s, port = %d, host = %s" % (db,user,port,host))
-        psqlConnect = "dbname=%s user=%s host=%s port=%d" % (db,user,host,port)
+        self.psqlConnect = "dbname=%s user=%s host=%s port=%d connect_timeout=5" % (db,user,host,port)
+        self.schema = 'public.'
+        self.pool_size = pool_size
+        self.autocommit = autocommit
+        self.pool = None
+        self.local = threading.local()
+        self.owners = {}  # thread ident -> (thread, connection)
+        self.pool_lock = threading.Lock()
+        # one permit per pooled connection: a checkout waits for a free one
+        # (up to checkout_timeout s) instead of failing straight away
+        self.available = threading.BoundedSemaphore(pool_size)
+        self.checkout_timeout = 10.0
+        # without a pool (database down at startup) checkouts retry connect()
+        # lazily, backing off from 1 s to at most 60 s between attempts
+        self.connect_lock = threading.Lock()
+        self.connect_backoff = 1.0
+        self.next_connect = 0.0
+        self.scids = {}
+        self.connect()
+
+    # ---------------- Connections ----------------
+    def connect(self):
+        try:
+            self.pool = psycopg2.pool.ThreadedConnectionPool(1, self.pool_size, self.psqlConnect)
+            self.connect_backoff = 1.0
+            return True
+        except psycopg2.Error as e:
+            print("SQL error ...", e)
+            self.pool = None
+            return False
+
+    def _ensurePool(self):
+        if self.pool is not None:
+            return True
+        with self.connect_lock:
+            if self.pool is not None:
+                return True
+            if time.monotonic() < self.next_connect:
+                return False
+            if self.connect():
+                return True
+            self.next_connect = time.monotonic() + self.connect_backoff
+            self.connect_backoff = min(self.connect_backoff * 2, 60.0)
+            return False
+
+    def _reap(self):
+        # give back connections of threads that have ended
+        with self.pool_lock:
+            for owner, (thread, conn) in list(self.owners.items()):
+                if not thread.is_alive():
+                    self.pool.putconn(conn, key=owner, close=bool(conn.closed))
+                    del self.owners[owner]
+                    self.available.release()
+
+    def _checkout(self):
+        if not self._ensurePool():
+            raise psycopg2.InterfaceError("SQL: not connected")
+        ident = threading.get_ident()
+        deadline = time.monotonic() + self.checkout_timeout
+        while True:
+            self._reap()
+            if self.available.acquire(timeout=0.5):
+                break
+            if time.monotonic() >= deadline:
+                raise psycopg2.pool.PoolError("SQL: no free connection after %.0f s" % (self.checkout_timeout))
         try:
-            self.db = psycopg2.connect(psqlConnect)
-            self.schema = 'public.'
-            self.DBconn = self.db.cursor()
-        except:
-            print("SQL error ...")
+            with self.pool_lock:
+                conn = self.pool.getconn(key=ident)
+                self.owners[ident] = (threading.current_thread(), conn)
+        except psycopg2.Error:
+            self.available.release()
+            raise
+        if conn.autocommit != self.autocommit:
+            conn.autocommit = self.autocommit
+        self.local.conn = conn
+        self.local.cursor = conn.cursor()
+        return conn
+
+    def release(self):
+        """Return the calling thread's connection to the pool."""
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            return
+        self.local.conn = self.local.cursor = None
+        if not conn.closed:
+            try:
+                conn.rollback()
+            except psycopg2.Error:
+                pass
+        with self.pool_lock:
+            if self.owners.pop(threading.get_ident(), None) is None:
+                return
+            if self.pool is not None:
+                self.pool.putconn(conn, key=threading.get_ident(), close=bool(conn.closed))
+            self.available.release()
+
+    def _connection(self):
+        conn = getattr(self.local, "conn", None)
+        if conn is not None and conn.closed:
+            # dropped by the server: replace it
+            self.release()
+            conn = None
+        if conn is None:
+            conn = self._checkout()
+        return conn
 
+    @property
+    def db(self):
+        return self._connection()
+
+    @property
+    def DBconn(self):
+        self._connection()
+        return self.local.cursor
+
+    def connected(self):
+        conn = getattr(self.local, "conn", None)
+        return self._ensurePool() and (conn is None or not conn.closed)
+
+    def reconnect(self):
+        # drop this thread's (broken) connection; the next use checks out a
+        # fresh one
+        self.release()
+        if self.pool is None:
+            return self.connect()
+        try:
+            self._connection()
+            return True
+        except psycopg2.Error as e:
+            print("SQL error ...", e)
+            self.release()
+            return False
+
+    @contextmanager
+    def connection(self):
+        """Hold a pooled connection for the block, then return it."""
+        held = getattr(self.local, "conn", None) is not None
+        try:
+            yield self.db
+        finally:
+            if not held:
+                self.release()
+
+    @contextmanager
+    def transaction(self):
+        """Cursor for one transaction: committed at the end, rolled back on error."""
+        with self.connection() as conn:
+            try:
+                yield self.DBconn
+                conn.commit()
+            except Exception:
+                self.rollback()
+                raise
+
+    def rollback(self):
+        # also used after the connection has dropped
+        try:
+            self.db.rollback()
+        except (psycopg2.Error, AttributeError):
+            pass
 
     def commit(self):
         self.db.commit()
@@ -32,9 +204,304 @@ class SQL:
         try:
             self.DBconn.execute(sql_str)
             self.db.commit()
-        except:
-            print("SQL(): executeSQL: error")
+            return True
+        except psycopg2.Error as e:
+            print("SQL(): executeSQL: error", e)
+            self.rollback()
+            return False
+
+    # ---------------- Schema ----------------
+    # Tables and indexes the queries below rely on. slow_control_data is
+    # filtered by scid and time range (composite btree) and scanned by time
+    # alone (BRIN, tiny for an append-only table in time order).
+
+    TABLES = {
+        "slow_control_items": "scid serial primary key, name text not null unique",
+        "slow_control_data": "scid integer not null, value double precision, time timestamptz not null",
+    }
+    PARTITION_BY = {"slow_control_data": "range (time)"}
+    INDEXES = {
+        "slow_control_data_scid_time_idx": ("slow_control_data", "btree", "scid, time"),
+        "slow_control_data_time_brin": ("slow_control_data", "brin", "time"),
+    }
+
+    def createSchema(self):
+        """
+        Create missing tables and indexes. Safe to run on every start.
+        Returns False when the database could not be reached.
+        """
+        if not self.connected():
+            print("SQL(): createSchema: not connected")
+            return False
+        try:
+            for table, columns in self.TABLES.items():
+                partition = " partition by %s" % (self.PARTITION_BY[table]) if table in self.PARTITION_BY else ""
+                self.executeSQL("create table if not exists %s%s (%s)%s" % (self.schema, table, columns, partition))
+            self.createRollupTables()
+            partitioned = self.isPartitioned()
+            if partitioned:
+                self.createPartitions()
+
+            # build concurrently so a large existing table stays writable; that
+            # cannot run inside a transaction block, nor on a partitioned table
+            # (there the index is created per partition, new ones inherit it)
+            concurrently = "" if partitioned else "concurrently "
+            autocommit = self.db.autocommit
+            self.db.autocommit = True
+            try:
+                for name, (table, method, columns) in self.INDEXES.items():
+                    if self._fetchValue("select to_regclass('%s%s')" % (self.schema, name)) is not None:
+                        continue
+                    print("SQL(): createSchema: building index %s on %s (%s)" % (name, table, columns))
+                    sql = "create index %sif not exists %s on %s%s using %s (%s)" % (
+                        concurrently, name, self.schema, table, method, columns)
+                    if (self.Debug):
+                        print("SQL(): createSchema: %s" % (sql))
+                    try:
+                        self.DBconn.execute(sql)
+                    except psycopg2.Error as e:
+                        print("SQL(): createSchema: index %s failed: %s" % (name, e))
+            finally:
+                self.db.autocommit = autocommit
+        except psycopg2.Error as e:
+            print("SQL(): createSchema failed:", e)
+            self.rollback()
+            return False
+        return True
+
+    def validateSchema(self):
+        """
+        Check that every table exists and that slow_control_data has a
+        valid index of each required kind (under any name). Returns a list
+        of problems, empty when the schema is complete.
+        """
+        if not self.connected():
+            print("SQL(): validateSchema: not connected")
+            return ["database not connected"]
+        problems = []
+        schema = self.schema.rstrip(".")
+        try:
+            for table in list(self.TABLES) + ["slow_control_rollup_%s" % name for name in self.ROLLUPS]:
+                self.DBconn.execute("select to_regclass('%s%s')" % (self.schema, table))
+                if self.DBconn.fetchone()[0] is None:
+                    problems.append("missing table %s" % (table))
+
+            self.DBconn.execute(
+                "select c.relname, pg_get_indexdef(i.indexrelid) from pg_index i "
+                "join pg_class c on c.oid = i.indexrelid "
+                "join pg_class t on t.oid = i.indrelid "
+                "join pg_namespace n on n.oid = t.relnamespace "
+                "where n.nspname = '%s' and i.indisvalid" % (schema)
+            )
+            defs = [d.lower().replace('"', '') for _, d in self.DBconn.fetchall()]
             self.db.rollback()
+        except psycopg2.Error as e:
+            self.rollback()
+            print("SQL(): validateSchema: schema check failed:", e)
+            return ["schema check failed: %s" % (e)]
+
+        for name, (table, method, columns) in self.INDEXES.items():
+            wanted = "%s using %s (%s)" % (table, method, columns)
+            if not any(wanted in d for d in defs):
+                problems.append("missing %s index on %s (%s)" % (method, table, columns))
+
+        for problem in problems:
+            print("SQL(): validateSchema: %s" % (problem))
+        return problems
+
+    def bootstrap(self):
+        """createSchema() then validateSchema(); True when complete."""
+        if not self.createSchema():
+            return False
+        return not self.validateSchema()
+
+    # ---------------- Partitions ----------------
+    # slow_control_data is range partitioned by month
+    # (slow_control_data_YYYY_MM) with a default partition catching anything
+    # outside the created months. Partitions are created a few months ahead;
+    # raw partitions older than the retention period are dropped once the
+    # rollup tables cover them, so long-range history stays available at
+    # 1 min / 1 h resolution.
+
+    def _fetchValue(self,sql):
+        # read-only: end the implicit transaction so autocommit can be toggled
+        if (self.Debug):
+            print("SQL(): %s" % (sql))
+        self.DBconn.execute(sql)
+        row = self.DBconn.fetchone()
+        self.db.rollback()
+        return row[0] if row else None
+
+    # partition DDL locks the whole slow_control_data parent; give up after
+    # this long rather than stall inserts behind a waiting lock, and retry
+    # on the next maintenance run
+    LOCK_TIMEOUT = "5s"
+
+    def _executeDDL(self,sql):
+        if (self.Debug):
+            print("SQL(): %s" % (sql))
+        try:
+            self.DBconn.execute("set local lock_timeout = '%s'" % (self.LOCK_TIMEOUT))
+            self.DBconn.execute(sql)
+            self.db.commit()
+            return True
+        except psycopg2.Error as e:
+            print("SQL(): skipped, retrying on the next run: %s" % (str(e).strip()))
+            self.rollback()
+            return False
+
+    def isPartitioned(self):
+        return self._fetchValue(
+            "select relkind = 'p' from pg_class where oid = to_regclass('%sslow_control_data')" % (self.schema)
+        ) is True
+
+    def getPartitions(self):
+        """[(name, lower, upper)] of slow_control_data, bounds None when open."""
+        self.DBconn.execute(
+            "select c.relname, "
+            "(regexp_match(pg_get_expr(c.relpartbound, c.oid), 'FROM \\(''([^'']+)''\\)'))[1]::timestamptz, "
+            "(regexp_match(pg_get_expr(c.relpartbound, c.oid), 'TO \\(''([^'']+)''\\)'))[1]::timestamptz "
+            "from pg_inherits i join pg_class c on c.oid = i.inhrelid "
+            "where i.inhparent = to_regclass('%sslow_control_data') order by 3" % (self.schema)
+        )
+        partitions = self.DBconn.fetchall()
+        self.db.rollback()
+        return partitions
+
+    @staticmethod
+    def _addMonths(day,months):
+        month = day.month - 1 + months
+        return day.replace(year=day.year + month // 12, month=month % 12 + 1, day=1)
+
+    def createPartitions(self,months_ahead=2):
+        """Monthly partitions from the current month to months_ahead ahead."""
+        if self._fetchValue("select to_regclass('%sslow_control_data_default')" % (self.schema)) is None:
+            self._executeDDL(
+                "create table if not exists %sslow_control_data_default partition of %sslow_control_data default"
+                % (self.schema, self.schema)
+            )
+        uppers = [upper for _, _, upper in self.getPartitions() if upper is not None]
+        covered = max(uppers) if uppers else None
+
+        month = datetime.datetime.now(datetime.timezone.utc).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        for i in range(months_ahead + 1):
+            start = self._addMonths(month, i)
+            end = self._addMonths(month, i + 1)
+            # months already inside an existing (e.g. migrated) partition
+            if covered is not None and start < covered:
+                continue
+            name = "slow_control_data_%04d_%02d" % (start.year, start.month)
+            if self._fetchValue("select to_regclass('%s%s')" % (self.schema, name)) is not None:
+                continue
+            self._executeDDL(
+                "create table if not exists %sslow_control_data_%04d_%02d partition of %sslow_control_data "
+                "for values from ('%s') to ('%s')"
+                % (self.schema, start.year, start.month, self.schema, start.isoformat(), end.isoformat())
+            )
+
+    def applyRetention(self,keep_months=12,dry_run=False):
+        """
+        Drop raw partitions that end more than keep_months before the
+        current month, provided the 1 min rollup has been built past their
+        end. Returns the names of the dropped partitions.
+        """
+        month = datetime.datetime.now(datetime.timezone.utc).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        cutoff = self._addMonths(month, -keep_months)
+        rolled_up = self._fetchValue("select max(bucket) from %sslow_control_rollup_1m" % (self.schema))
+
+        dropped = []
+        for name, lower, upper in self.getPartitions():
+            if upper is None or upper > cutoff:
+                continue
+            if rolled_up is None or rolled_up < upper:
+                print("SQL(): applyRetention: keeping %s, rollups not built past %s" % (name, upper))
+                continue
+            print("SQL(): applyRetention: dropping %s (%s .. %s)" % (name, lower, upper))
+            if not dry_run and not self._executeDDL("drop table %s%s" % (self.schema, name)):
+                continue
+            dropped.append(name)
+        return dropped
+
+    def migrateToPartitioned(self):
+        """
+        Turn an existing plain slow_control_data into a partitioned table.
+        The old table becomes partition slow_control_data_legacy covering
+        everything up to the end of its newest month; monthly partitions
+        follow from there. The new parent copies the old table's column
+        definitions, so any existing column types attach unchanged. Takes
+        an exclusive lock while the bound is checked, so run it from
+        maintenance, not while writers are busy.
+        """
+        if self.isPartitioned():
+            print("SQL(): migrateToPartitioned: already partitioned")
+            return False
+
+        self.DBconn.execute(
+            "select column_name, data_type, is_nullable from information_schema.columns "
+            "where table_schema = '%s' and table_name = 'slow_control_data'" % (self.schema.rstrip("."))
+        )
+        columns = {name: (data_type, nullable == "YES") for name, data_type, nullable in self.DBconn.fetchall()}
+        self.db.rollback()
+        if "time" not in columns or not columns["time"][0].startswith("timestamp"):
+            print("SQL(): migrateToPartitioned: slow_control_data needs a timestamp column 'time', found %s"
+                  % (columns.get("time", ("none",))[0]))
+            return False
+
+        # the partition key must not be NULL; scid only if it can be
+        not_null = []
+        for column in ("time", "scid"):
+            if column not in columns or not columns[column][1]:
+                continue
+            nulls = self._fetchValue("select count(*) from %sslow_control_data where %s is null" % (self.schema, column))
+            if nulls and column == "time":
+                print("SQL(): migrateToPartitioned: %d rows have a NULL time; delete or fix them first" % (nulls))
+                return False
+            if nulls:
+                print("SQL(): migrateToPartitioned: %d rows have a NULL scid; keeping scid nullable" % (nulls))
+                continue
+            not_null.append(column)
+
+        newest = self._fetchValue("select max(time) from %sslow_control_data" % (self.schema))
+        month = newest or datetime.datetime.now(datetime.timezone.utc)
+        upper = self._addMonths(month.replace(day=1, hour=0, minute=0, second=0, microsecond=0), 1)
+
+        try:
+            self.DBconn.execute("set local lock_timeout = '%s'" % (self.LOCK_TIMEOUT))
+            self.DBconn.execute("alter table %sslow_control_data rename to slow_control_data_legacy" % (self.schema))
+            for name in self.INDEXES:
+                self.DBconn.execute("alter index if exists %s%s rename to %s_legacy" % (self.schema, name, name))
+            # a check constraint lets set not null and attach skip their scans
+            self.DBconn.execute(
+                "alter table %sslow_control_data_legacy add constraint legacy_bound "
+                "check (time is not null and time < '%s')" % (self.schema, upper.isoformat())
+            )
+            for column in not_null:
+                self.DBconn.execute("alter table %sslow_control_data_legacy alter column %s set not null"
+                                    % (self.schema, column))
+            self.DBconn.execute("create table %sslow_control_data (like %sslow_control_data_legacy "
+                                "including defaults) partition by %s"
+                                % (self.schema, self.schema, self.PARTITION_BY["slow_control_data"]))
+            self.DBconn.execute(
+                "alter table %sslow_control_data attach partition %sslow_control_data_legacy "
+                "for values from (minvalue) to ('%s')" % (self.schema, self.schema, upper.isoformat())
+            )
+            self.db.commit()
+        except psycopg2.Error as e:
+            print("SQL(): migrateToPartitioned failed, nothing changed:", e)
+            self.rollback()
+            return False
+
+        self.createSchema()
+        return True
+
+    def maintain(self,months_ahead=2,keep_months=12):
+        """Periodic upkeep: partitions ahead, rollups, raw retention."""
+        partitioned = self.isPartitioned()
+        if partitioned:
+            self.createPartitions(months_ahead)
+        self.updateRollups()
+        if partitioned and keep_months:
+            self.applyRetention(keep_months)
 
     def firstUpdate(self):
         sql_str = "select MIN(time) from %sslow_control_data" % (self.schema)
@@ -59,10 +526,10 @@ class SQL:
             return row
 
     def getSCID(self,name):
-        sql = "select * from %sslow_control_items where name='%s'" % (self.schema,name)
+        sql = "select * from %sslow_control_items where name=%%s" % (self.schema)
         if (self.Debug):
-            print("SQL(): getSCID: %s" % (sql))
-        self.DBconn.execute(sql)
+            print("SQL(): getSCID: %s [%s]" % (sql,name))
+        self.DBconn.execute(sql, (name,))
         if (self.DBconn.rowcount != 1):
             print("ERROR: SQL(): getSCID(%s) did not return exactly one row" % (name))
             return int(-1)
@@ -83,6 +550,36 @@ class SQL:
             print("Insert failed:", e)
             self.db.rollback()
 
+    def insertSCValues(self,rows):
+        """
+        Bulk insert [(name, value, timestamp)] in one transaction. Returns
+        False (nothing written) when the database could not be reached.
+        Unknown names are skipped.
+        """
+        try:
+            data = []
+            for name, value, timestamp in rows:
+                scid = self.scids.get(name)
+                if scid is None:
+                    scid = self.getSCID(name)
+                    if scid < 0:
+                        continue
+                    self.scids[name] = scid
+                data.append((scid, value, timestamp))
+            if (self.Debug):
+                print("SQL(): insertSCValues: %d rows" % (len(data)))
+            psycopg2.extras.execute_values(
+                self.DBconn,
+                "insert into %sslow_control_data (scid,value,time) values %%s" % (self.schema),
+                data, page_size=1000
+            )
+            self.db.commit()
+            return True
+        except (psycopg2.Error, AttributeError) as e:
+            print("Insert failed:", e)
+            self.rollback()
+            return False
+
     def insertSCValueByName(self,name,value,timestamp=None):
 
         if timestamp is None:
@@ -196,5 +693,159 @@ class SQL:
             data.append(d)
         return data
         
+    def getSCRange(self,scids,start_time,end_time,bucket=0):
+        """
+        All samples of several channels between start_time and end_time
+        (unix seconds) in one query. With bucket > 0 the rows are aggregated
+        into bucket-second bins server-side.
+        Returns {scid: {"times": [...], "min": [...], "max": [...], "mean": [...], "last": [...]}}.
+        """
+        if isinstance(start_time, datetime.datetime):
+            start_time = start_time.timestamp()
+        if isinstance(end_time, datetime.datetime):
+            end_time = end_time.timestamp()
+
+        data = {scid: {"times": [], "min": [], "max": [], "mean": [], "last": []} for scid in scids}
+        if not scids:
+            return data
+        ids = ",".join("%d" % scid for scid in scids)
+
+        if bucket > 0:
+            sql = (
+                "select scid, floor(extract(epoch from time) / %f) * %f as bucket, "
+                "min(value), max(value), avg(value), "
+                "(array_agg(value order by time desc))[1] "
+                "from %sslow_control_data "
+                "where scid in (%s) and time >= to_timestamp(%f) and time < to_timestamp(%f) "
+                "group by scid, bucket order by scid, bucket"
+            ) % (bucket, bucket, self.schema, ids, start_time, end_time)
+        else:
+            sql = (
+                "select scid, extract(epoch from time), value, value, value, value "
+                "from %sslow_control_data "
+                "where scid in (%s) and time >= to_timestamp(%f) and time < to_timestamp(%f) "
+                "order by scid, time"
+            ) % (self.schema, ids, start_time, end_time)
+        if (self.Debug):
+            print("SQL(): getSCRange: %s" % (sql))
+        self.DBconn.execute(sql)
+
+        for scid, t, lo, hi, mean, last in self.DBconn.fetchall():
+            series = data[scid]
+            series["times"].append(float(t))
+            series["min"].append(lo)
+            series["max"].append(hi)
+            series["mean"].append(float(mean))
+            series["last"].append(last)
+        return data
+
+    # ---------------- Rollups ----------------
+    # slow_control_rollup_1m / _1h hold min, max, avg, count and last value
+    # per scid and minute / hour. updateRollups() refreshes them incrementally
+    # from the newest stored bucket on; the hour table is built from the
+    # minute table.
+
+    ROLLUPS = {"1m": 60, "1h": 3600}
+
+    def createRollupTables(self):
+        for name in self.ROLLUPS:
+            self.executeSQL(
+                "create table if not exists %sslow_control_rollup_%s ("
+                "scid integer not null, bucket timestamptz not null, "
+                "min double precision, max double precision, avg double precision, "
+                "count integer, last double precision, "
+                "primary key (scid, bucket))" % (self.schema, name)
+            )
+
+    def updateRollups(self,since=None):
+        """
+        Recompute rollup buckets from `since` (datetime) on, or from the
+        newest bucket already stored. Safe to repeat: rows are upserted.
+        """
+        upsert = (
+            "on conflict (scid, bucket) do update set min = excluded.min, max = excluded.max, "
+            "avg = excluded.avg, count = excluded.count, last = excluded.last"
+        )
+        try:
+            start = since
+            if start is None:
+                self.DBconn.execute("select max(bucket) from %sslow_control_rollup_1m" % (self.schema))
+                start = self.DBconn.fetchone()[0]
+            where = "" if start is None else "where time >= date_trunc('minute', timestamptz '%s')" % (start)
+            sql = (
+                "insert into %sslow_control_rollup_1m (scid, bucket, min, max, avg, count, last) "
+                "select scid, date_trunc('minute', time) as bucket, min(value), max(value), avg(value), "
+                "count(*), (array_agg(value order by time desc))[1] "
+                "from %sslow_control_data %s group by scid, bucket %s"
+            ) % (self.schema, self.schema, where, upsert)
+            if (self.Debug):
+                print("SQL(): updateRollups: %s" % (sql))
+            self.DBconn.execute(sql)
+
+            start = since
+            if start is None:
+                self.DBconn.execute("select max(bucket) from %sslow_control_rollup_1h" % (self.schema))
+                start = self.DBconn.fetchone()[0]
+            where = "" if start is None else "where bucket >= date_trunc('hour', timestamptz '%s')" % (start)
+            sql = (
+                "insert into %sslow_control_rollup_1h (scid, bucket, min, max, avg, count, last) "
+                "select scid, date_trunc('hour', bucket) as hour, min(min), max(max), "
+                "sum(avg * count) / sum(count), sum(count), (array_agg(last order by bucket desc))[1] "
+                "from %sslow_control_rollup_1m %s group by scid, hour %s"
+            ) % (self.schema, self.schema, where, upsert)
+            if (self.Debug):
+                print("SQL(): updateRollups: %s" % (sql))
+            self.DBconn.execute(sql)
+            self.db.commit()
+        except psycopg2.Error as e:
+            print("Rollup update failed:", e)
+            self.rollback()
+
+    def getSCRollup(self,scids,start_time,end_time,resolution="1m",bucket=0):
+        """
+        Like getSCRange() but read from the 1m or 1h rollup table. With
+        bucket larger than the rollup resolution the rollup rows are merged
+        further into bucket-second bins.
+        """
+        if isinstance(start_time, datetime.datetime):
+            start_time = start_time.timestamp()
+        if isinstance(end_time, datetime.datetime):
+            end_time = end_time.timestamp()
+
+        data = {scid: {"times": [], "min": [], "max": [], "mean": [], "last": []} for scid in scids}
+        if not scids:
+            return data
+        ids = ",".join("%d" % scid for scid in scids)
+
+        if bucket > self.ROLLUPS[resolution]:
+            sql = (
+                "select scid, floor(extract(epoch from bucket) / %f) * %f as b, "
+                "min(min), max(max), sum(avg * count) / sum(count), "
+                "(array_agg(last order by bucket desc))[1] "
+                "from %sslow_control_rollup_%s "
+                "where scid in (%s) and bucket >= to_timestamp(%f) and bucket < to_timestamp(%f) "
+                "group by scid, b order by scid, b"
+            ) % (bucket, bucket, self.schema, resolution, ids, start_time, end_time)
+        else:
+            sql = (
+                "select scid, extract(epoch from bucket), min, max, avg, last "
+                "from %sslow_control_rollup_%s "
+                "where scid in (%s) and bucket >= to_timestamp(%f) and bucket < to_timestamp(%f) "
+                "order by scid, bucket"
+            ) % (self.schema, resolution, ids, start_time, end_time)
+        if (self.Debug):
+            print("SQL(): getSCRollup: %s" % (sql))
+        self.DBconn.execute(sql)
+
+        for scid, t, lo, hi, mean, last in self.DBconn.fetchall():
+            series = data[scid]
+            series["times"].append(float(t))
+            series["min"].append(lo)
+            series["max"].append(hi)
+            series["mean"].append(float(mean))
+            series["last"].append(last)
+        return data
+
     def close(self):
-        self.db.close()
+        if self.pool is not None:
+            self.pool.closeall()
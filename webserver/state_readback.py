@@ -0,0 +1,106 @@
+import threading
+import time
+
+from controller import hardware_lock
+from device import get_channels_for_device
+
+class DeviceStateReader(threading.Thread):
+    """
+    Samples the actual control state of the devices (heater setpoints, PID
+    modes and outputs, AIO voltages, still output) on a slow schedule and
+    caches it. get_state() only returns the cache, so serving it costs no
+    serial traffic.
+    """
+
+    def __init__(self, devices, interval=10.0):
+        super().__init__(daemon=True)
+        self.devices = devices
+        self.interval = interval
+        self._stop_event = threading.Event()
+        self._refresh_event = threading.Event()
+
+        self._lock = threading.Lock()
+        self._state = {}
+        self._timestamp = None
+        # last seen IOType per (device, AIO channel), to log mode changes once
+        self._iotypes = {}
+
+    # ---------------- Readback ----------------
+    def read_channel(self, dev, kind, channel):
+        if kind == "heater":
+            return {
+                "kind": kind,
+                "pid_mode": dev.read_PID_mode(channel),
+                "setpoint": dev.read_setpoint(channel),
+                "output": dev.get_output(channel),
+            }
+        elif kind == "switch":
+            # the voltage only reads back in 'Set out' mode; other modes are
+            # reported as they are rather than as an error on every poll
+            iotype = dev.get_aio_iotype(channel)
+            if self._iotypes.get((dev, channel)) != iotype:
+                if iotype != 'Set out':
+                    print(f"[StateReader] {channel} is in '{iotype}' mode, not reading its voltage")
+                self._iotypes[(dev, channel)] = iotype
+            if iotype != 'Set out':
+                return {"kind": kind, "iotype": iotype}
+            return {
+                "kind": kind,
+                "iotype": iotype,
+                "voltage": dev.get_aio_voltage(channel),
+            }
+        elif kind == "still_heater":
+            return {
+                "kind": kind,
+                "output": dev.still_heater_output_query(),
+            }
+        return {"kind": kind}
+
+    def read_state(self):
+        state = {}
+        for name, dev in self.devices.items():
+            channels = get_channels_for_device(name)
+            if not channels:
+                continue
+
+            state[name] = {}
+            for channel, kind in channels.items():
+                # one channel at a time so readout is not starved
+                with hardware_lock:
+                    try:
+                        state[name][channel] = self.read_channel(dev, kind, channel)
+                    except Exception as e:
+                        print(f"[StateReader] Failed to read {name}:{channel}: {e}")
+                        state[name][channel] = {"kind": kind, "error": str(e)}
+        return state
+
+    # ---------------- Cache ----------------
+    def get_state(self):
+        with self._lock:
+            return {"time": self._timestamp, "devices": self._state}
+
+    def refresh(self):
+        """Request a new sample as soon as possible (e.g. after a write)."""
+        self._refresh_event.set()
+
+    # ---------------- Thread Loop ----------------
+    def stop(self):
+        self._stop_event.set()
+        self._refresh_event.set()
+
+    def run(self):
+        print("[StateReader] Starting device state readback...")
+
+        while not self._stop_event.is_set():
+            self._refresh_event.clear()
+            try:
+                state = self.read_state()
+                with self._lock:
+                    self._state = state
+                    self._timestamp = time.time()
+            except Exception as e:
+                print("[StateReader] ERROR during readback:", e)
+
+            self._refresh_event.wait(self.interval)
+
+        print("[StateReader] Stopped.")
@@ -0,0 +1,135 @@
+from collections import deque
+
+# ---------------- Trend estimation ----------------
+# Windowed least-squares fit of value vs. time, updated per sample. Running
+# sums over the window are kept so adding a sample and reading the slope,
+# noise or stable flag are O(1) (amortised over samples leaving the window).
+
+STABLE_TOLERANCE = 1e-3 / 60  # K/s, i.e. 1 mK/min
+
+class TrendEstimator:
+    """
+    Slope, mean and noise of one channel over the last `window` seconds.
+
+    slope is in K/s, gradient(per=60) in K/min. noise is the RMS residual
+    about the fitted line. stable is True once at least `min_samples` are in
+    the window and |slope| <= tolerance.
+    """
+
+    def __init__(self, window=300.0, min_samples=5, tolerance=STABLE_TOLERANCE):
+        self.window = window
+        self.min_samples = min_samples
+        self.tolerance = tolerance
+
+        self.samples = deque()
+        # times are stored relative to t0 to keep the sums well conditioned
+        self.t0 = None
+        self._reset_sums()
+
+    def _reset_sums(self):
+        self.n = 0
+        self.st = self.sy = self.stt = self.sty = self.syy = 0.0
+
+    def _add_sums(self, x, y, sign):
+        self.n += sign
+        self.st += sign * x
+        self.sy += sign * y
+        self.stt += sign * x * x
+        self.sty += sign * x * y
+        self.syy += sign * y * y
+
+    def add(self, t, y):
+        if hasattr(t, "timestamp"):
+            t = t.timestamp()
+        if self.t0 is None:
+            self.t0 = t
+        x = t - self.t0
+
+        self.samples.append((x, y))
+        self._add_sums(x, y, +1)
+
+        while self.samples and x - self.samples[0][0] > self.window:
+            old_x, old_y = self.samples.popleft()
+            self._add_sums(old_x, old_y, -1)
+
+        # once the window has moved far from t0, re-base and recompute the
+        # sums from scratch (O(window), happens once per 100 windows)
+        if x > 100 * self.window:
+            shift = self.samples[0][0]
+            self.t0 += shift
+            self.samples = deque((sx - shift, sy) for sx, sy in self.samples)
+            self._reset_sums()
+            for sx, sy in self.samples:
+                self._add_sums(sx, sy, +1)
+
+    # ---------------- Estimates ----------------
+    @property
+    def last(self):
+        return self.samples[-1][1] if self.samples else None
+
+    @property
+    def mean(self):
+        return self.sy / self.n if self.n else None
+
+    def _centered(self):
+        n = self.n
+        var_t = self.stt - self.st * self.st / n
+        cov_ty = self.sty - self.st * self.sy / n
+        var_y = self.syy - self.sy * self.sy / n
+        return var_t, cov_ty, var_y
+
+    @property
+    def slope(self):
+        if self.n < 2:
+            return None
+        var_t, cov_ty, _ = self._centered()
+        if var_t <= 0:
+            return None
+        return cov_ty / var_t
+
+    def gradient(self, per=60.0):
+        slope = self.slope
+        return slope * per if slope is not None else None
+
+    @property
+    def noise(self):
+        if self.n < 3:
+            return None
+        var_t, cov_ty, var_y = self._centered()
+        residual = var_y - (cov_ty * cov_ty / var_t if var_t > 0 else 0.0)
+        return (max(residual, 0.0) / (self.n - 2)) ** 0.5
+
+    @property
+    def stable(self):
+        if self.n < self.min_samples:
+            return False
+        slope = self.slope
+        return slope is not None and abs(slope) <= self.tolerance
+
+    def snapshot(self):
+        return {
+            "value": self.last,
+            "gradient": self.gradient(),
+            "noise": self.noise,
+            "stable": self.stable,
+        }
+
+class TrendSet:
+    """One TrendEstimator per channel, created on first sample."""
+
+    def __init__(self, **options):
+        self.options = options
+        self.estimators = {}
+
+    def update(self, t, values: dict):
+        for channel, value in values.items():
+            estimator = self.estimators.get(channel)
+            if estimator is None:
+                estimator = self.estimators[channel] = TrendEstimator(**self.options)
+            estimator.add(t, value)
+
+    def get(self, channel):
+        return self.estimators.get(channel)
+
+    def summary(self):
+        return {channel: e.snapshot() for channel, e in self.estimators.items()}